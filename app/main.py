@@ -28,10 +28,14 @@ from app.components import (
     render_stream_token,
 )
 from app.utils import extract_json, sanitize_result, compute_retrieval_score
-from pipeline.retriever import retrieve
+from pipeline.retriever import retrieve_for_case
 from pipeline.prompt_builder import build_prompt
+from pipeline.warmup import start_warmup
 from inference.llm_client import call_llm
 
+# Load the model / open the collection in the background while the form renders
+start_warmup()
+
 # ─── Page Config ────────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="MediAssist RAG -- Clinical Decision Support",
@@ -62,9 +66,11 @@ if submitted and patient_data["chief_complaint"]:
     timings = {}  # latency per stage
 
     t0 = time.perf_counter()
+    stage_timings = {}  # filled by retrieve_for_case() with its re-rank latency
     with st.spinner("Retrieving relevant medical literature..."):
-        chunks = retrieve(patient_data["chief_complaint"])
-    timings["Retrieval"] = time.perf_counter() - t0
+        chunks = retrieve_for_case(patient_data, timings=stage_timings)
+    timings["Retrieval"] = time.perf_counter() - t0 - sum(stage_timings.values())
+    timings.update(stage_timings)
 
     # Compute aggregate retrieval confidence from chunk similarity scores
     retrieval_score = compute_retrieval_score(chunks)
@@ -1,7 +1,7 @@
-from groq import Groq
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import threading
 import yaml
 
 load_dotenv()
@@ -10,10 +10,23 @@ _CONFIG_PATH = Path(__file__).parent.parent / "config.yaml"
 with open(_CONFIG_PATH) as f:
     config = yaml.safe_load(f)
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Create the Groq client on first use (groq is imported lazily)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from groq import Groq
+
+            _client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        return _client
+
 
 def call_llm(prompt, stream=True):
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model=os.getenv("MODEL_NAME", "llama3-70b-8192"),
         messages=[{"role": "user", "content": prompt}],
         max_tokens=config['max_tokens_output'],
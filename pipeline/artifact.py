@@ -0,0 +1,141 @@
+"""
+Portable precomputed-embedding artifact: one Parquet file per index.
+
+Restoring or migrating an index from it is a bulk copy instead of a BioBERT
+pass over the whole corpus.  One row per chunk:
+
+    id          string   chunk id
+    collection  string   Chroma collection it belongs to
+    text        string   chunk text
+    metadata    string   JSON metadata
+    doc_hash    string   content hash of the parent document (manifest entry), may be null
+    vector      fixed_size_binary(dim * itemsize)  little-endian float16 / float32
+
+The schema metadata key ``mediassist.artifact`` holds the JSON header
+{"format", "model", "dim", "dtype", "settings"}, settings being those of the
+index manifest (chunking, shard key), so an import can restore it; readers check it before loading.  The row
+count is in the Parquet footer (`read_header` adds it as "count").
+"""
+
+from pathlib import Path
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+_HEADER_KEY = b"mediassist.artifact"
+
+
+def _schema(dim: int, dtype: np.dtype, header: dict):
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("collection", pa.string()),
+            ("text", pa.string()),
+            ("metadata", pa.string()),
+            ("doc_hash", pa.string()),
+            ("vector", pa.binary(dim * dtype.itemsize)),
+        ],
+        metadata={_HEADER_KEY: json.dumps(header).encode("utf-8")},
+    )
+
+
+class ArtifactWriter:
+    """Stream pages of chunks into an artifact, written to a temporary file and
+    moved into place by close(), so a failed export never leaves a partial one."""
+
+    def __init__(self, path: Path, model: str, dtype: str = "float16", settings: dict | None = None):
+        self.path = Path(path)
+        self.model = model
+        self.settings = settings
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.dim = None
+        self.count = 0
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._writer = None
+
+    def add(self, collection: str, ids: list, texts: list, metas: list, vectors: np.ndarray,
+            doc_hashes: list | None = None) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self._writer is None:
+            self.dim = vectors.shape[1]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            header = {"format": FORMAT_VERSION, "model": self.model, "dim": self.dim,
+                      "dtype": self.dtype.name, "settings": self.settings}
+            self._writer = pq.ParquetWriter(self._tmp, _schema(self.dim, self.dtype, header),
+                                            compression="zstd")
+        raw = np.ascontiguousarray(vectors.astype(self.dtype))
+        width = self.dim * self.dtype.itemsize
+        vector_col = pa.FixedSizeBinaryArray.from_buffers(
+            pa.binary(width), len(raw), [None, pa.py_buffer(raw.tobytes())]
+        )
+        self._writer.write_table(pa.Table.from_arrays(
+            [
+                pa.array(ids, pa.string()),
+                pa.array([collection] * len(ids), pa.string()),
+                pa.array(texts, pa.string()),
+                pa.array([json.dumps(m or {}) for m in metas], pa.string()),
+                pa.array(doc_hashes or [None] * len(ids), pa.string()),
+                vector_col,
+            ],
+            schema=self._writer.schema,
+        ))
+        self.count += len(ids)
+
+    def close(self) -> None:
+        if self._writer is None:
+            raise ValueError("Empty artifact: nothing was added")
+        self._writer.close()
+        os.replace(self._tmp, self.path)
+
+
+def read_header(path: Path) -> dict:
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(path).metadata or {}
+    if _HEADER_KEY not in metadata:
+        raise ValueError(f"{path} is not an embedding artifact (no {_HEADER_KEY.decode()} header)")
+    header = json.loads(metadata[_HEADER_KEY])
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: artifact format {header.get('format')}, expected {FORMAT_VERSION}")
+    header["count"] = pq.ParquetFile(path).metadata.num_rows
+    return header
+
+
+def read_artifact(path: Path, batch_size: int = 4096):
+    """Yield pages {'collection', 'ids', 'texts', 'metas', 'doc_hashes', 'vectors'} (float32),
+    grouped so each page belongs to a single collection."""
+    import pyarrow.parquet as pq
+
+    header = read_header(path)
+    dtype = np.dtype(header["dtype"]).newbyteorder("<")
+    # Only the string columns become Python objects; the vectors are read from the buffer.
+    columns = ["id", "collection", "text", "metadata", "doc_hash"]
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        cols = {name: batch.column(name).to_pylist() for name in columns}
+        vector_col = batch.column("vector")
+        # Fixed-width binary: the values buffer is the packed vectors, row after row.
+        width = header["dim"] * dtype.itemsize
+        raw = np.frombuffer(vector_col.buffers()[1], dtype=np.uint8)
+        start = vector_col.offset * width
+        vectors = raw[start:start + len(batch) * width].view(dtype).reshape(len(batch), header["dim"])
+        vectors = vectors.astype(np.float32)
+        collections = cols["collection"]
+        begin = 0
+        for end in range(1, len(batch) + 1):
+            if end == len(batch) or collections[end] != collections[begin]:
+                yield {
+                    'collection': collections[begin],
+                    'ids':        cols["id"][begin:end],
+                    'texts':      cols["text"][begin:end],
+                    'metas':      [json.loads(m) for m in cols["metadata"][begin:end]],
+                    'doc_hashes': cols["doc_hash"][begin:end],
+                    'vectors':    vectors[begin:end],
+                }
+                begin = end
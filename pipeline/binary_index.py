@@ -0,0 +1,107 @@
+"""
+Binary-quantized first-pass search over a NumpyIndex.
+
+Each embedding is reduced to one sign bit per dimension, after subtracting the
+corpus mean so the bits are balanced, and packed into bytes: 96 bytes for a
+768-d vector instead of 3 KB of float32.  A query is scored against every code
+by Hamming distance (XOR + popcount); the closest ``rescore`` documents are then
+re-scored exactly with the float vectors of the NumpyIndex, which stay
+memory-mapped and are only read for that shortlist.
+
+Layout of an index directory:
+    codes.npy   (n, dim / 8) uint8 packed sign bits, in NumpyIndex row order
+    mean.npy    (dim,) float32 corpus mean subtracted before taking signs
+    meta.json   {"model", "dim", "count"}
+"""
+
+from pathlib import Path
+import json
+
+import numpy as np
+
+from pipeline.numpy_index import NumpyIndex, top_k
+
+# Rows encoded / scored per block; bounds the temporaries.
+_BLOCK = 65536
+
+# Set bits per byte value, for NumPy builds without np.bitwise_count (< 2.0).
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _POPCOUNT[x]
+
+
+def binarize(vectors: np.ndarray, mean: np.ndarray) -> np.ndarray:
+    """Packed sign bits of ``vectors - mean``: (m, dim) float -> (m, dim / 8) uint8."""
+    return np.packbits(np.atleast_2d(vectors) > mean, axis=1)
+
+
+def build_binary_index(base: NumpyIndex, path: Path) -> dict:
+    """Write sign-bit codes for every vector of ``base``; returns the meta.json contents."""
+    n, dim = len(base), int(base.meta["dim"])
+    total = np.zeros(dim, dtype=np.float64)
+    for start in range(0, n, _BLOCK):
+        total += np.asarray(base.embeddings[start:start + _BLOCK], dtype=np.float64).sum(axis=0)
+    mean = (total / max(1, n)).astype(np.float32)
+
+    codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+    for start in range(0, n, _BLOCK):
+        block = np.asarray(base.embeddings[start:start + _BLOCK], dtype=np.float32)
+        codes[start:start + len(block)] = binarize(block, mean)
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / "codes.npy", codes)
+    np.save(path / "mean.npy", mean)
+    meta = {"model": base.meta["model"], "dim": dim, "count": n}
+    with open(path / "meta.json", "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class BinaryIndex:
+    """Hamming shortlist with exact re-scoring; same interface as NumpyIndex."""
+
+    def __init__(self, path: Path, base: NumpyIndex, rescore: int = 200):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        if self.meta["count"] != len(base) or self.meta["model"] != base.meta["model"]:
+            raise ValueError(f"Binary index at {self.path} does not match the NumPy index; "
+                             "rebuild it with scripts/build_index.py --binary")
+        self.base = base
+        self.rescore = rescore
+        self.codes = np.load(self.path / "codes.npy")
+        self.mean = np.load(self.path / "mean.npy")
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def hamming(self, query_vec: np.ndarray) -> np.ndarray:
+        """(n,) Hamming distance between the query's code and every document's."""
+        q = binarize(query_vec, self.mean)[0]
+        out = np.empty(len(self), dtype=np.int32)
+        for start in range(0, len(self), _BLOCK):
+            block = self.codes[start:start + _BLOCK]
+            out[start:start + len(block)] = _popcount(block ^ q).sum(axis=1, dtype=np.int32)
+        return out
+
+    def query(self, query_vecs: np.ndarray, n: int, with_embeddings: bool = False) -> list:
+        """Top-n hits per query: [[{'id','text','meta','score'}, ...], ...]."""
+        results = []
+        for q in np.atleast_2d(query_vecs).astype(np.float32, copy=False):
+            rows = np.sort(top_k(-self.hamming(q), max(n, self.rescore)))
+            exact = np.asarray(self.base.embeddings[rows], dtype=np.float32) @ q
+            best = top_k(exact, n)
+            results.append([self.base.hit(rows[i], exact[i], with_embeddings) for i in best])
+        return results
+
+    def get(self, ids: list) -> list:
+        return self.base.get(ids)
+
+    def resident_bytes(self) -> int:
+        """RAM held by the index itself (the float vectors stay on disk)."""
+        return self.codes.nbytes + self.mean.nbytes
@@ -0,0 +1,147 @@
+"""
+Compact on-disk BM25 inverted index.
+
+Built by scripts/build_index.py next to the Chroma collection and queried
+alongside the vector search, so exact drug names and rare disease terms that
+BioBERT embeds poorly still surface.
+
+Layout of an index directory:
+    vocab.json     {term: [postings offset, document frequency]}
+    postings.npy   int32 document numbers, grouped by term
+    tf.npy         uint16 term frequencies, parallel to postings.npy
+    doc_len.npy    int32 token count per document
+    ids.json       document number -> collection id
+    meta.json      {"count", "avgdl", "k1", "b"}
+"""
+
+from array import array
+from collections import Counter
+from pathlib import Path
+import json
+import math
+import os
+import re
+import shutil
+
+import numpy as np
+
+from pipeline.numpy_index import top_k
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with what which who whom does do did not no than then "
+    "there these those into been being".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased word tokens; hyphenated names (co-trimoxazole) stay whole."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Builder:
+    """Accumulate documents in memory and write a BM25 index directory."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.doc_len = array("i")
+        self._docs = {}   # term -> array of document numbers
+        self._tfs = {}    # term -> array of term frequencies
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, doc_id: str, text: str) -> None:
+        doc = len(self.ids)
+        tokens = tokenize(text)
+        self.ids.append(doc_id)
+        self.doc_len.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            if term not in self._docs:
+                self._docs[term] = array("i")
+                self._tfs[term] = array("H")
+            self._docs[term].append(doc)
+            self._tfs[term].append(min(tf, 65535))
+
+    def write(self, path: Path) -> None:
+        """Write the index atomically (a temp directory renamed into place)."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        vocab, offset = {}, 0
+        postings = np.empty(sum(len(d) for d in self._docs.values()), dtype=np.int32)
+        tfs = np.empty(len(postings), dtype=np.uint16)
+        for term in sorted(self._docs):
+            docs = self._docs[term]
+            postings[offset:offset + len(docs)] = docs
+            tfs[offset:offset + len(docs)] = self._tfs[term]
+            vocab[term] = [offset, len(docs)]
+            offset += len(docs)
+
+        np.save(tmp / "postings.npy", postings)
+        np.save(tmp / "tf.npy", tfs)
+        np.save(tmp / "doc_len.npy", np.asarray(self.doc_len, dtype=np.int32))
+        with open(tmp / "vocab.json", "w") as f:
+            json.dump(vocab, f)
+        with open(tmp / "ids.json", "w") as f:
+            json.dump(self.ids, f)
+        avgdl = float(np.mean(self.doc_len)) if len(self.doc_len) else 0.0
+        with open(tmp / "meta.json", "w") as f:
+            json.dump({"count": len(self.ids), "avgdl": avgdl, "k1": self.k1, "b": self.b}, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+
+class BM25Index:
+    """Memory-mapped BM25 scorer."""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        with open(path / "vocab.json") as f:
+            self.vocab = json.load(f)
+        with open(path / "ids.json") as f:
+            self.ids = json.load(f)
+        self.count = meta["count"]
+        self.k1, self.b = meta["k1"], meta["b"]
+        self.postings = np.load(path / "postings.npy", mmap_mode="r")
+        self.tf = np.load(path / "tf.npy", mmap_mode="r")
+        doc_len = np.load(path / "doc_len.npy").astype(np.float32)
+        # Per-document length normalisation, precomputed once.
+        self._norm = self.k1 * (1 - self.b + self.b * doc_len / max(meta["avgdl"], 1e-9))
+
+    def search(self, query: str, n: int) -> list:
+        """Top-n (collection id, bm25 score) pairs, best first."""
+        scores = np.zeros(self.count, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            docs = self.postings[offset:offset + df]
+            tf = self.tf[offset:offset + df].astype(np.float32)
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self._norm[docs])
+            matched = True
+        if not matched:
+            return []
+        rows = top_k(scores, n)
+        return [(self.ids[r], float(scores[r])) for r in rows if scores[r] > 0]
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """Fuse several best-first id lists; returns ids ordered by sum(1 / (k + rank))."""
+    fused = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, 1):
+            fused[id_] = fused.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
@@ -0,0 +1,54 @@
+"""
+Token-aware chunking of documents for indexing.
+
+The embedding model truncates its input, so a long abstract embedded whole is
+only searchable by its first few hundred tokens.  `Chunker` cuts each
+document into windows of `chunk_size` tokens (special tokens included) that
+overlap by `chunk_overlap`, using the embedding model's own tokenizer and its
+character offsets so every window is an exact slice of the original text.
+Windows are capped at the encoder's ``max_seq_length`` (the length
+SentenceTransformer truncates to, often below the tokenizer's
+``model_max_length``) when it is passed in.
+"""
+
+
+class Chunker:
+    """Split texts into overlapping token windows that fit the embedding model."""
+
+    def __init__(self, tokenizer, chunk_size: int = 512, chunk_overlap: int = 50,
+                 max_seq_length: int | None = None):
+        self.tokenizer = tokenizer
+        limit = chunk_size
+        model_max = getattr(tokenizer, "model_max_length", None)
+        if model_max and model_max < 100_000:  # tokenizers without a limit report ~1e30
+            limit = min(limit, model_max)
+        if max_seq_length:
+            limit = min(limit, max_seq_length)
+        self.window = max(1, limit - tokenizer.num_special_tokens_to_add())
+        self.stride = max(1, self.window - chunk_overlap)
+
+    @classmethod
+    def from_pretrained(cls, model_name: str, chunk_size: int = 512, chunk_overlap: int = 50,
+                        max_seq_length: int | None = None) -> "Chunker":
+        from transformers import AutoTokenizer
+
+        return cls(AutoTokenizer.from_pretrained(model_name, use_fast=True), chunk_size, chunk_overlap,
+                   max_seq_length)
+
+    def split(self, text: str) -> list:
+        """Windows of ``text`` in document order; a short text is one window."""
+        text = text.strip()
+        if not text:
+            return []
+        offsets = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )["offset_mapping"]
+        if len(offsets) <= self.window:
+            return [text]
+        chunks = []
+        for start in range(0, len(offsets), self.stride):
+            end = min(start + self.window, len(offsets))
+            chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+            if end == len(offsets):
+                break
+        return chunks
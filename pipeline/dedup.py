@@ -0,0 +1,237 @@
+"""
+MinHash / LSH near-duplicate detection for scripts/build_index.py.
+
+Each document is reduced to its set of word n-gram shingles and summarised by
+a MinHash signature: ``num_perm`` minima of random hash permutations, where
+the fraction of equal positions in two signatures estimates the Jaccard
+similarity of the shingle sets.  Signatures are split into ``bands`` of
+``rows`` each; documents sharing any band are candidates, and a candidate is
+a duplicate if its estimated Jaccard similarity reaches ``threshold``.
+
+Documents are checked in stream order, so the first copy seen is the
+canonical one and only canonical documents are indexed.
+
+State is kept in flat arrays, about 1.3 KB per canonical document with its
+id and hash: signatures (uint32), band keys (uint64), and per band a bucket
+table of chain heads with a next-row link per document (int32).  ``save()`` persists the
+signatures and each document's content hash and verdict, and a deduper
+loaded from them re-uses the verdict of every document whose hash is
+unchanged instead of re-shingling and re-signing it.
+"""
+
+from pathlib import Path
+import json
+import os
+import re
+import shutil
+import zlib
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+_KEY_MULT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _bands(threshold: float, num_perm: int) -> tuple:
+    """(bands, rows) whose LSH S-curve threshold (1/b)^(1/r) is closest to ``threshold``."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHashDeduper:
+    """Streaming near-duplicate filter: ``check(doc_id, text, digest)`` returns the id
+    of the canonical document ``text`` duplicates, or None (and remembers it as canonical)."""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5,
+                 seed: int = 0, capacity: int = 1024):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = _bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: ((a*x + b) mod 2**64) >> 32 with odd a, no division needed.
+        self._a = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+        self._n = 0
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._keys = np.zeros((0, self.bands), dtype=np.uint64)
+        self._next = np.zeros((0, self.bands), dtype=np.int32)
+        self._active = np.zeros(0, dtype=bool)
+        self._heads = np.zeros((self.bands, 0), dtype=np.int32)
+        self._ids = []        # row -> doc id
+        self._digests = []    # row -> content hash
+        self._canonical = set()  # ids of rows confirmed in this run
+        self._unchanged = set()  # ... of which those re-used unchanged from the last run
+        self._duplicates = {}    # doc id -> (content hash, canonical id), this run
+        self._known = {}         # doc id -> (content hash, row or -1, canonical id), from the last run
+        self._grow(capacity)
+
+    # ─── Storage ────────────────────────────────────────────────────────────
+
+    def _grow(self, capacity: int) -> None:
+        """Resize the row arrays to ``capacity`` and rebuild the bucket tables."""
+        def resized(a, fill=0):
+            out = np.full((capacity,) + a.shape[1:], fill, dtype=a.dtype)
+            out[:self._n] = a[:self._n]
+            return out
+
+        self._signatures = resized(self._signatures)
+        self._keys = resized(self._keys)
+        self._next = resized(self._next, -1)
+        self._active = resized(self._active, False)
+        size = 1 << max(1, (2 * capacity - 1).bit_length())  # power of two >= 2 x capacity
+        self._heads = np.full((self.bands, size), -1, dtype=np.int32)
+        self._mask = np.uint64(size - 1)
+        n = self._n
+        self._next[:n] = -1
+        for band in range(self.bands if n else 0):
+            # Chain rows sharing a bucket, each row linking to the previous one.
+            buckets = (self._keys[:n, band] & self._mask).astype(np.int64)
+            order = np.argsort(buckets, kind="stable")
+            ordered = buckets[order]
+            same = ordered[1:] == ordered[:-1]
+            self._next[order[1:][same], band] = order[:-1][same]
+            last = np.append(~same, True)
+            self._heads[band, ordered[last]] = order[last]
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """uint64 hash of each band of each signature: shape (len(signatures), bands)."""
+        banded = signatures[:, :self.bands * self.rows].reshape(len(signatures), self.bands, self.rows)
+        keys = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for r in range(self.rows):
+            keys = (keys ^ banded[:, :, r].astype(np.uint64)) * _KEY_MULT
+        return keys
+
+    def _append(self, doc_id: str, digest: str | None, signature: np.ndarray, keys: np.ndarray) -> int:
+        if self._n == len(self._signatures):
+            self._grow(2 * len(self._signatures))
+        row = self._n
+        self._n += 1
+        self._signatures[row] = signature
+        self._keys[row] = keys
+        self._ids.append(doc_id)
+        self._digests.append(digest)
+        for band, key in enumerate(keys):
+            bucket = int(key & self._mask)
+            self._next[row, band] = self._heads[band, bucket]
+            self._heads[band, bucket] = row
+        return row
+
+    # ─── Signatures ─────────────────────────────────────────────────────────
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """32-bit hashes of the word n-grams of ``text`` (lower-cased)."""
+        tokens = np.array([zlib.crc32(t.encode("utf-8")) for t in _TOKEN_RE.findall(text.lower())],
+                          dtype=np.uint64)
+        if len(tokens) == 0:
+            return tokens
+        k = min(self.shingle_size, len(tokens))
+        # Polynomial hash of each window of k token hashes, kept to 32 bits.
+        hashes = np.zeros(len(tokens) - k + 1, dtype=np.uint64)
+        for j in range(k):
+            hashes = (hashes * np.uint64(1000003) + tokens[j:len(tokens) - k + 1 + j]) & np.uint64(0xFFFFFFFF)
+        return np.unique(hashes)
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self._shingles(text)
+        if len(shingles) == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        permuted = (shingles[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    # ─── Checking ───────────────────────────────────────────────────────────
+
+    def check(self, doc_id: str, text: str, digest: str | None = None) -> str | None:
+        """Canonical id ``text`` near-duplicates, or None.  With ``digest`` (the
+        content hash), a document unchanged since the saved run keeps its verdict
+        without being signed again."""
+        known = self._known.pop(doc_id, None)
+        if known is not None and digest is not None and known[0] == digest:
+            _, row, canonical = known
+            if canonical is None:
+                self._active[row] = True
+                self._canonical.add(doc_id)
+                self._unchanged.add(doc_id)
+                return None
+            if canonical in self._unchanged:  # else its canonical changed or is gone: check again
+                self._duplicates[doc_id] = (digest, canonical)
+                return canonical
+
+        signature = self.signature(text)
+        keys = self._band_keys(signature[None, :])[0]
+        tried = set()
+        for band, key in enumerate(keys):
+            n = int(self._heads[band, int(key & self._mask)])
+            while n != -1:
+                if (n not in tried and self._keys[n, band] == key and self._active[n]
+                        and self._ids[n] != doc_id):
+                    tried.add(n)
+                    if np.mean(self._signatures[n] == signature) >= self.threshold:
+                        self._duplicates[doc_id] = (digest, self._ids[n])
+                        return self._ids[n]
+                n = int(self._next[n, band])
+        row = self._append(doc_id, digest, signature, keys)
+        self._active[row] = True
+        self._canonical.add(doc_id)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    # ─── Persistence ────────────────────────────────────────────────────────
+
+    def _params(self) -> dict:
+        return {"threshold": self.threshold, "num_perm": self.num_perm,
+                "shingle_size": self.shingle_size, "seed": self.seed}
+
+    def save(self, path: Path) -> None:
+        """Persist the documents checked in this run (written to a sibling
+        directory and swapped in, so a failed save keeps the previous state)."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        rows = np.flatnonzero(self._active[:self._n])
+        np.save(tmp / "signatures.npy", self._signatures[rows])
+        docs = [[self._ids[r], self._digests[r], None] for r in rows]
+        docs += [[doc_id, digest, canonical] for doc_id, (digest, canonical) in self._duplicates.items()]
+        with open(tmp / "docs.json", "w") as f:
+            json.dump({"params": self._params(), "docs": docs}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5,
+             seed: int = 0) -> "MinHashDeduper":
+        """A deduper primed with the state saved at ``path``, or an empty one if
+        there is none or it was saved with other parameters."""
+        deduper = cls(threshold, num_perm, shingle_size, seed)
+        try:
+            with open(Path(path) / "docs.json") as f:
+                saved = json.load(f)
+            signatures = np.load(Path(path) / "signatures.npy")
+        except (OSError, ValueError):
+            return deduper
+        if saved.get("params") != deduper._params():
+            return deduper
+
+        canonical = [(doc_id, digest) for doc_id, digest, dup_of in saved["docs"] if dup_of is None]
+        n = len(canonical)
+        deduper._grow(max(1024, 1 << max(0, n - 1).bit_length()))
+        deduper._signatures[:n] = signatures
+        deduper._keys[:n] = deduper._band_keys(signatures)
+        deduper._ids = [doc_id for doc_id, _ in canonical]
+        deduper._digests = [digest for _, digest in canonical]
+        deduper._n = n
+        deduper._grow(len(deduper._signatures))  # chain the loaded rows
+        deduper._known = {doc_id: (digest, row, None) for row, (doc_id, digest) in enumerate(canonical)}
+        deduper._known.update((doc_id, (digest, -1, dup_of))
+                              for doc_id, digest, dup_of in saved["docs"] if dup_of is not None)
+        return deduper
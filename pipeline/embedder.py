@@ -1,29 +1,263 @@
-from sentence_transformers import SentenceTransformer
+from pipeline.embedding_cache import EmbeddingCache
+from concurrent.futures import Future
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+import itertools
+import queue
+import threading
+import time
+import numpy as np
 import yaml
 
-try:
-    from streamlit import cache_resource as _cache_resource
-except ImportError:          # Not running inside Streamlit (e.g. scripts/)
-    def _cache_resource(fn):  # noqa: D401 – simple passthrough
-        return fn
+if TYPE_CHECKING:            # torch + sentence_transformers are imported lazily
+    from sentence_transformers import SentenceTransformer
 
-_CONFIG_PATH = Path(__file__).parent.parent / "config.yaml"
+_PROJECT_ROOT = Path(__file__).parent.parent
+_CONFIG_PATH = _PROJECT_ROOT / "config.yaml"
 with open(_CONFIG_PATH) as f:
     config = yaml.safe_load(f)
 
+_model = None
+_model_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-text encodes into one batched forward pass.
+
+    Callers ``submit()`` a text and block on the returned future.  A daemon
+    thread takes the first queued request, keeps collecting for up to
+    ``max_wait_ms`` or until ``max_batch`` requests are queued, encodes the
+    unique texts in one call and resolves every caller's future.
+    """
+
+    def __init__(self, encode, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        fut = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [(t, f) for t, f in self._collect() if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            unique = list(dict.fromkeys(t for t, _ in batch))
+            try:
+                vecs = dict(zip(unique, self._encode(unique)))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for text, fut in batch:
+                fut.set_result(vecs[text])
+
+
+def _onnx_model(quantization: str | None) -> "SentenceTransformer":
+    """Export the configured model to ONNX once (optionally int8-quantized) and
+    load it through onnxruntime.
+
+    The sentence-transformers pipeline is unchanged apart from the transformer
+    module, so pooling and normalisation match the torch model exactly.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    name = config["embedding_model"]
+    export_dir = _PROJECT_ROOT / config['onnx_path'].lstrip("./") / name.replace("/", "__")
+    if not (export_dir / "onnx" / "model.onnx").exists():
+        SentenceTransformer(name, backend="onnx").save_pretrained(str(export_dir))
+    if not quantization:
+        return SentenceTransformer(str(export_dir), backend="onnx")
+
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not (export_dir / file_name).exists():
+        export_dynamic_quantized_onnx_model(
+            SentenceTransformer(str(export_dir), backend="onnx"),
+            quantization_config=quantization,
+            model_name_or_path=str(export_dir),
+        )
+    return SentenceTransformer(str(export_dir), backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def load_model(backend: str = "torch", quantization: str | None = None) -> "SentenceTransformer":
+    """Build the embedding model for the given backend ("torch" or "onnx")."""
+    if backend == "onnx":
+        return _onnx_model(quantization)
+    if backend != "torch":
+        raise ValueError(f"Unknown embedding_backend: {backend!r}")
+    from sentence_transformers import SentenceTransformer
 
-@_cache_resource(show_spinner="Loading medical embedding model...")
-def get_model() -> SentenceTransformer:
-    """Load (and cache across Streamlit reruns) the BioBERT embedding model."""
     return SentenceTransformer(config["embedding_model"])
 
 
-def embed_text(text: str) -> list:
-    model = get_model()
-    return model.encode(text).tolist()
+def model_id() -> str:
+    """Identity of the configured model + backend, used to key cached vectors."""
+    name = config["embedding_model"]
+    if config.get('embedding_backend', 'torch') == "onnx":
+        name = f"{name}@onnx-{config.get('onnx_quantization') or 'fp32'}"
+    return f"{name}#l2"  # vectors are unit-normalised at encode time
+
+
+def get_model() -> "SentenceTransformer":
+    """Load the BioBERT embedding model once per process.
+
+    A module-level singleton rather than ``st.cache_resource`` so the
+    background warm-up thread (pipeline/warmup.py) can load it outside the
+    Streamlit script context; it survives reruns just the same.
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = load_model(config.get('embedding_backend', 'torch'), config.get('onnx_quantization'))
+        return _model
+
 
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide query-embedding cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            disk_size = config.get('embedding_cache_disk_size', 0)
+            _cache = EmbeddingCache(
+                model_id    = model_id(),
+                path        = _PROJECT_ROOT / config['embedding_cache_path'].lstrip("./") if disk_size else None,
+                memory_size = config.get('embedding_cache_size', 1024),
+                disk_size   = disk_size,
+            )
+        return _cache
 
-def embed_batch(texts: list) -> list:
+
+def get_batcher() -> MicroBatcher | None:
+    """Process-wide micro-batcher, or None when batching is disabled."""
+    global _batcher
+    window_ms = config.get('embedding_batch_window_ms', 0)
+    if window_ms <= 0:
+        return None
+    with _batcher_lock:
+        if _batcher is None:
+            model = get_model()
+            max_batch = config.get('embedding_batch_max_size', 32)
+            _batcher = MicroBatcher(
+                lambda texts: _encode(model, texts, max_batch),
+                max_batch   = max_batch,
+                max_wait_ms = window_ms,
+            )
+        return _batcher
+
+
+def embedding_cache_stats() -> dict:
+    """Hit/miss counters for the query-embedding cache."""
+    return get_embedding_cache().stats()
+
+
+def _encode(model, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+    """Encode to unit-normalised float32, so cosine similarity is a plain dot product."""
+    return model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        **kwargs,
+    ).astype(np.float32, copy=False)
+
+
+def embed_text(text: str) -> np.ndarray:
+    """Unit-normalised float32 vector of shape (dim,)."""
+    cache = get_embedding_cache()
+    vec = cache.get(text)
+    if vec is None:
+        batcher = get_batcher()
+        vec = batcher.submit(text).result() if batcher else _encode(get_model(), text)
+        cache.put(text, vec)
+    return vec
+
+
+def embed_texts(texts: list) -> np.ndarray:
+    """Embed a handful of queries through the cache.  Misses go through the
+    micro-batcher, so they share a forward pass with other sessions' queries,
+    or are encoded in one pass of their own when batching is disabled.
+    Returns a (len(texts), dim) float32 matrix."""
+    cache = get_embedding_cache()
+    vecs = [cache.get(text) for text in texts]
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vecs) if v is None))
+    if missing:
+        batcher = get_batcher()
+        if batcher:
+            futures = [batcher.submit(text) for text in missing]
+            encoded = {text: fut.result() for text, fut in zip(missing, futures)}
+        else:
+            encoded = dict(zip(missing, _encode(get_model(), missing)))
+        for text, vec in encoded.items():
+            cache.put(text, vec)
+        vecs = [encoded[t] if v is None else v for t, v in zip(texts, vecs)]
+    return np.stack(vecs)
+
+
+def embed_batch(texts: list) -> np.ndarray:
+    """Unit-normalised float32 matrix of shape (len(texts), dim)."""
+    return _encode(get_model(), texts, batch_size=32, show_progress_bar=True)
+
+
+
+def embed_stream(texts: Iterable[str], window: int | None = None,
+                 token_budget: int | None = None) -> Iterator[np.ndarray]:
+    """Embed an arbitrarily long stream of texts, yielding vectors in input order.
+
+    Texts are read ``window`` at a time, sorted by token length, and encoded
+    in batches sized so that (batch size x longest sequence) stays within
+    ``token_budget`` -- short texts go in wide batches, long ones in narrow
+    ones, and almost no compute is spent on padding.  Only one window is held
+    in memory at a time.
+    """
+    window = window or config.get('embed_window', 1024)
+    token_budget = token_budget or config.get('embed_token_budget', 16384)
     model = get_model()
-    return model.encode(texts, batch_size=32, show_progress_bar=True).tolist()
\ No newline at end of file
+    max_len = model.max_seq_length
+
+    it = iter(texts)
+    while True:
+        buf = list(itertools.islice(it, window))
+        if not buf:
+            return
+        input_ids = model.tokenizer(buf, truncation=True, max_length=max_len)["input_ids"]
+        lengths = np.array([len(ids) for ids in input_ids])
+        out = [None] * len(buf)
+
+        batch = []
+        for idx in np.argsort(lengths, kind="stable"):
+            # Ascending order: the text being added is the longest in the batch.
+            if batch and (len(batch) + 1) * lengths[idx] > token_budget:
+                _encode_into(model, buf, batch, out)
+                batch = []
+            batch.append(idx)
+        _encode_into(model, buf, batch, out)
+        yield from out
+
+
+def _encode_into(model, buf: list, batch: list, out: list) -> None:
+    vecs = _encode(model, [buf[i] for i in batch], batch_size=len(batch))
+    for i, vec in zip(batch, vecs):
+        out[i] = vec
@@ -0,0 +1,276 @@
+"""
+Two-tier cache for query embeddings.
+
+Tier 1 is an in-process LRU of float32 vectors.  Tier 2 is a fixed-capacity
+``vectors.npy`` file that is memory-mapped on open, plus an append-only
+``keys.log`` recording which key each row holds, so frequent chief complaints
+stay warm across app restarts.
+
+Keys are derived from the model name and the normalised query text, and the
+disk tier records the model it was built with; opening it with a different
+model wipes it, so a change of ``embedding_model`` can never serve stale
+vectors.  Each log line carries a CRC32 of the row it points at and reads
+verify it, so a row overwritten (or half-written) after its line was logged
+is a miss, never another query's vector.  The directory is locked by the
+process that opens it; other processes fall back to the memory tier.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+import warnings
+import zlib
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a query used for cache keys.
+
+    Applies NFKC and collapses runs of whitespace.  Case is preserved because
+    the BioBERT tokenizer is cased, so "ECG" and "ecg" embed differently.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def _write_json_atomic(path: Path, payload) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _crc(vec: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(vec, dtype=np.float32).tobytes())
+
+
+def _lock_dir(path: Path):
+    """Exclusive, non-blocking lock on ``path``/lock, held for the life of the
+    returned file; raises BlockingIOError if another process holds it."""
+    f = open(path / "lock", "a")
+    try:
+        import fcntl
+    except ImportError:  # Windows: no advisory locks, one process per directory is on the caller
+        return f
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise BlockingIOError(f"{path} is in use by another process")
+    return f
+
+
+class _DiskStore:
+    """Fixed-capacity, LRU-evicting vector store backed by a memmapped .npy.
+
+    Rows are written outside the store lock and published afterwards with one
+    appended log line; the log is compacted once it holds ``COMPACT_FACTOR``
+    lines per live entry.
+    """
+
+    FORMAT = 2
+    COMPACT_FACTOR = 4
+
+    def __init__(self, path: Path, model_id: str, capacity: int):
+        self.path = Path(path)
+        self.model_id = model_id
+        self.capacity = capacity
+        self._vectors = None
+        self._slots: OrderedDict = OrderedDict()  # key -> (row, crc)
+        self._free = []
+        self._log = None
+        self._log_lines = 0
+        self._lock = threading.Lock()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._dir_lock = _lock_dir(self.path)
+        meta = self._read_meta()
+        if (meta and meta.get("format") == self.FORMAT and meta.get("model") == model_id
+                and meta.get("capacity") == capacity):
+            try:
+                self._vectors = np.load(self.path / "vectors.npy", mmap_mode="r+")
+                self._replay()
+            except (OSError, ValueError):
+                self._reset()
+        else:
+            self._reset()
+        used = {row for row, _ in self._slots.values()}
+        self._free = [row for row in range(capacity - 1, -1, -1) if row not in used]
+        if self._log_lines > max(len(self._slots), 1) * self.COMPACT_FACTOR:
+            self._compact()
+        self._log = open(self.path / "keys.log", "a")
+
+    def _read_meta(self) -> dict | None:
+        try:
+            with open(self.path / "meta.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _replay(self) -> None:
+        """Rebuild the key index from the log; a later line for a row supersedes
+        earlier ones, and a torn last line is skipped."""
+        owner = {}
+        with open(self.path / "keys.log") as f:
+            for line in f:
+                self._log_lines += 1
+                try:
+                    key, row, crc = line.split()
+                    row, crc = int(row), int(crc)
+                except ValueError:
+                    continue
+                if not 0 <= row < self.capacity:
+                    continue
+                previous = owner.pop(row, None)
+                if previous is not None:
+                    self._slots.pop(previous, None)
+                if key in self._slots:
+                    owner.pop(self._slots[key][0], None)
+                owner[row] = key
+                self._slots[key] = (row, crc)
+                self._slots.move_to_end(key)
+
+    def _compact(self) -> None:
+        """Rewrite the log with one line per live entry, in LRU order."""
+        if self._log is not None:
+            self._log.close()
+        tmp = self.path / "keys.log.tmp"
+        with open(tmp, "w") as f:
+            f.writelines(f"{key} {row} {crc}\n" for key, (row, crc) in self._slots.items())
+        os.replace(tmp, self.path / "keys.log")
+        self._log_lines = len(self._slots)
+        self._log = open(self.path / "keys.log", "a")
+
+    def _reset(self) -> None:
+        """Drop everything on disk; the vector file is recreated on first put."""
+        for name in ("vectors.npy", "keys.json", "keys.log", "meta.json"):
+            (self.path / name).unlink(missing_ok=True)
+        self._vectors = None
+        self._slots = OrderedDict()
+        self._log_lines = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            entry = self._slots.get(key)
+            if entry is None:
+                return None
+            self._slots.move_to_end(key)
+        row, crc = entry
+        vec = np.array(self._vectors[row], dtype=np.float32)
+        # A mismatch means the row was reused after this line was written.
+        return vec if _crc(vec) == crc else None
+
+    def put(self, key: str, vec: np.ndarray) -> None:
+        with self._lock:
+            if key in self._slots:
+                return
+            if self._vectors is None:
+                self._vectors = np.lib.format.open_memmap(
+                    self.path / "vectors.npy",
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(self.capacity, vec.shape[-1]),
+                )
+                _write_json_atomic(
+                    self.path / "meta.json",
+                    {"format": self.FORMAT, "model": self.model_id,
+                     "capacity": self.capacity, "dim": int(vec.shape[-1])},
+                )
+            if self._free:
+                row = self._free.pop()
+            else:
+                _, (row, _) = self._slots.popitem(last=False)
+
+        # The row is owned by this call until it is published below.
+        self._vectors[row] = vec
+        crc = _crc(self._vectors[row])
+
+        with self._lock:
+            if key in self._slots:  # a concurrent put of the same query won
+                self._free.append(row)
+                return
+            self._slots[key] = (row, crc)
+            self._log.write(f"{key} {row} {crc}\n")
+            self._log.flush()
+            self._log_lines += 1
+            if self._log_lines > len(self._slots) * self.COMPACT_FACTOR:
+                self._compact()
+
+
+class EmbeddingCache:
+    """Memory LRU in front of an optional on-disk store, with hit/miss counters."""
+
+    def __init__(self, model_id: str, path: Path | None = None,
+                 memory_size: int = 1024, disk_size: int = 0):
+        self.model_id = model_id
+        self.memory_size = memory_size
+        self._memory: OrderedDict = OrderedDict()
+        self._disk = None
+        if path and disk_size > 0:
+            try:
+                self._disk = _DiskStore(path, model_id, disk_size)
+            except BlockingIOError as e:
+                warnings.warn(f"Embedding disk cache disabled: {e}")
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        if self.memory_size <= 0:
+            return
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = self.key(text)
+        with self._lock:
+            vec = self._memory.get(key)
+            if vec is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vec
+        # Disk reads and writes happen outside the lock, so memory hits never wait on them.
+        vec = self._disk.get(key) if self._disk is not None else None
+        with self._lock:
+            if vec is None:
+                self.misses += 1
+                return None
+            vec.setflags(write=False)
+            self._remember(key, vec)
+            self.disk_hits += 1
+            return vec
+
+    def put(self, text: str, vec) -> None:
+        key = self.key(text)
+        vec = np.array(vec, dtype=np.float32)
+        vec.setflags(write=False)
+        with self._lock:
+            self._remember(key, vec)
+        if self._disk is not None:
+            self._disk.put(key, vec)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits":   self.disk_hits,
+                "misses":      self.misses,
+                "hit_rate":    round(hits / total, 3) if total else 0.0,
+                "memory_size": len(self._memory),
+                "disk_size":   len(self._disk) if self._disk is not None else 0,
+            }
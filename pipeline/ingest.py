@@ -0,0 +1,140 @@
+"""
+Threaded stages connected by bounded queues, for streaming ingestion.
+
+scripts/build_index.py runs read -> preprocess -> embed -> write as a chain of
+`Stage`s, each on its own thread, with at most ``queue_size`` batches waiting
+between two stages.  Memory is therefore bounded by the queue sizes rather
+than the corpus, and the embedding of batch N+1 overlaps the write of batch N.
+
+Every stage records how long it was busy, i.e. not blocked on its input or
+output queue, so the end-of-run report shows which stage is the bottleneck.
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StageStats:
+    """Items processed and busy / wall time of one stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.wall = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Items per busy second: the stage's throughput if it never had to wait."""
+        return self.items / self.busy if self.busy > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.name:<11} {self.items:>9} items  busy {self.busy:7.1f}s of {self.wall:7.1f}s  "
+                f"{self.rate:9.1f} items/s while busy")
+
+
+def _timed(iterable, stats: StageStats, blocked: list):
+    """Iterate ``iterable``, adding the time spent waiting for each item to blocked[0]."""
+    it = iter(iterable)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        finally:
+            blocked[0] += time.perf_counter() - t0
+        yield item
+
+
+class Stage:
+    """Run ``fn(inputs)`` (or ``fn()`` for a source) on a thread; iterate the Stage for its outputs.
+
+    ``size(output)`` is how many items an output counts as (default: len, for batches).
+    An exception in the stage is re-raised in the consumer.
+    """
+
+    def __init__(self, name: str, fn, upstream=None, queue_size: int = 4, size=len):
+        self.stats = StageStats(name)
+        self.upstream = upstream
+        self._fn = fn
+        self._size = size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-{name}", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        start = time.perf_counter()
+        blocked = [0.0]
+        try:
+            outputs = self._fn() if self.upstream is None else self._fn(_timed(self.upstream, self.stats, blocked))
+            for out in outputs:
+                t0 = time.perf_counter()
+                if not self._put(out):
+                    return
+                blocked[0] += time.perf_counter() - t0
+                self.stats.items += self._size(out)
+            self._put(_DONE)
+        except BaseException as e:  # handed to the consumer
+            self._put(_Failure(e))
+        finally:
+            self.stats.wall = time.perf_counter() - start
+            self.stats.busy = self.stats.wall - blocked[0]
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def close(self) -> None:
+        """Stop this stage and everything upstream of it (e.g. after a consumer error)."""
+        self._stop.set()
+        if isinstance(self.upstream, Stage):
+            self.upstream.close()
+
+    def all_stats(self) -> list:
+        """Stats of this stage and its upstream stages, source first."""
+        self._thread.join(timeout=1.0)  # let a finishing stage record its times
+        before = self.upstream.all_stats() if isinstance(self.upstream, Stage) else []
+        return before + [self.stats]
+
+
+def drain(name: str, upstream: Stage, fn, size=len) -> list:
+    """Call ``fn(item)`` for every output of ``upstream`` on this thread.
+
+    Returns the stats of every stage, source first, ending with this sink's.
+    """
+    stats = StageStats(name)
+    blocked = [0.0]
+    start = time.perf_counter()
+    try:
+        for item in _timed(upstream, stats, blocked):
+            fn(item)
+            stats.items += size(item)
+    finally:
+        upstream.close()
+        stats.wall = time.perf_counter() - start
+        stats.busy = stats.wall - blocked[0]
+    return upstream.all_stats() + [stats]
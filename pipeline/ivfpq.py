@@ -0,0 +1,172 @@
+"""
+IVF-PQ approximate index over a NumpyIndex, for corpora too large to score
+exhaustively or to hold as float vectors in RAM.
+
+Layout of an index directory:
+    centroids.npy     (nlist, dim) float32 coarse (IVF) centroids
+    codebooks.npy     (m, ksub, dim / m) float32 product-quantizer codebooks
+    codes.npy         (n, m) uint8 PQ codes of each vector's residual, grouped by list
+    list_rows.npy     int32 (n,) NumpyIndex row of each code
+    list_offsets.npy  int64 (nlist + 1,) start of each inverted list in codes.npy
+    meta.json         {"model", "dim", "count", "nlist", "m", "ksub"}
+
+Only the codes (m bytes per document) and the small tables are resident; a
+query scores the ``nprobe`` closest lists through per-subspace lookup tables,
+then re-scores a shortlist exactly with the float vectors of the underlying
+NumpyIndex, which stay memory-mapped and are only touched for that shortlist.
+"""
+
+from pathlib import Path
+import json
+
+import numpy as np
+
+from pipeline.numpy_index import NumpyIndex, top_k
+
+# Rows assigned / encoded per block; bounds the temporaries during a build.
+_BLOCK = 16384
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest (L2) centroid for each row of x."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), _BLOCK):
+        block = x[start:start + _BLOCK]
+        out[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return out
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are re-seeded from random points."""
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _encode(residuals: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    m, _, dsub = codebooks.shape
+    codes = np.empty((len(residuals), m), dtype=np.uint8)
+    for j in range(m):
+        codes[:, j] = _assign(residuals[:, j * dsub:(j + 1) * dsub], codebooks[j])
+    return codes
+
+
+def build_ivfpq(base: NumpyIndex, path: Path, nlist: int | None = None, m: int = 96,
+                train_size: int = 65536, iters: int = 20, seed: int = 0) -> dict:
+    """Train coarse centroids and PQ codebooks on a sample of ``base`` and encode it all.
+
+    ``nlist`` defaults to 4 * sqrt(n).  Returns the meta.json contents.
+    """
+    n, dim = len(base), int(base.meta["dim"])
+    if dim % m:
+        raise ValueError(f"ivf_pq_m={m} must divide the embedding dimension {dim}")
+    dsub = dim // m
+    nlist = max(1, min(nlist or int(4 * np.sqrt(n)), n))
+    ksub = min(256, n)
+    rng = np.random.default_rng(seed)
+
+    sample_rows = np.sort(rng.choice(n, min(train_size, n), replace=False))
+    sample = np.asarray(base.embeddings[sample_rows], dtype=np.float32)
+    centroids = _kmeans(sample, nlist, iters, rng)
+    residuals = sample - centroids[_assign(sample, centroids)]
+    codebooks = np.stack([
+        _kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), ksub, iters, rng)
+        for j in range(m)
+    ])
+
+    labels = np.empty(n, dtype=np.int64)
+    codes = np.empty((n, m), dtype=np.uint8)
+    for start in range(0, n, _BLOCK):
+        block = np.asarray(base.embeddings[start:start + _BLOCK], dtype=np.float32)
+        block_labels = _assign(block, centroids)
+        labels[start:start + len(block)] = block_labels
+        codes[start:start + len(block)] = _encode(block - centroids[block_labels], codebooks)
+
+    order = np.argsort(labels, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / "centroids.npy", centroids.astype(np.float32))
+    np.save(path / "codebooks.npy", codebooks.astype(np.float32))
+    np.save(path / "codes.npy", codes[order])
+    np.save(path / "list_rows.npy", order.astype(np.int32))
+    np.save(path / "list_offsets.npy", offsets)
+    meta = {"model": base.meta["model"], "dim": dim, "count": n,
+            "nlist": nlist, "m": m, "ksub": ksub}
+    with open(path / "meta.json", "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class IVFPQIndex:
+    """Approximate search with exact re-scoring; same interface as NumpyIndex."""
+
+    def __init__(self, path: Path, base: NumpyIndex, nprobe: int = 16, rescore: int = 100):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        if self.meta["count"] != len(base) or self.meta["model"] != base.meta["model"]:
+            raise ValueError(f"IVF-PQ index at {self.path} does not match the NumPy index; "
+                             "rebuild it with scripts/build_index.py --ivf")
+        self.base = base
+        self.nprobe = nprobe
+        self.rescore = rescore
+        self.centroids = np.load(self.path / "centroids.npy")
+        self.codebooks = np.load(self.path / "codebooks.npy")
+        self.codes = np.load(self.path / "codes.npy")
+        self.list_rows = np.load(self.path / "list_rows.npy")
+        self.offsets = np.load(self.path / "list_offsets.npy")
+
+    def __len__(self) -> int:
+        return len(self.list_rows)
+
+    def _shortlist(self, q: np.ndarray, n: int, nprobe: int) -> np.ndarray:
+        """NumpyIndex rows of the best PQ-approximated candidates for one query."""
+        m, _, dsub = self.codebooks.shape
+        coarse = self.centroids @ q
+        # score(x) = q.c + q.r, and q.r decomposes over subspaces into table lookups.
+        lut = np.einsum("jkd,jd->jk", self.codebooks, q.reshape(m, dsub))
+        positions, approx = [], []
+        for lst in top_k(coarse, nprobe):
+            start, end = self.offsets[lst], self.offsets[lst + 1]
+            if start == end:
+                continue
+            codes = self.codes[start:end]
+            positions.append(np.arange(start, end))
+            approx.append(coarse[lst] + lut[np.arange(m), codes].sum(axis=1))
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        positions, approx = np.concatenate(positions), np.concatenate(approx)
+        best = positions[top_k(approx, max(n, self.rescore))]
+        return self.list_rows[best].astype(np.int64)
+
+    def query(self, query_vecs: np.ndarray, n: int, with_embeddings: bool = False,
+              nprobe: int | None = None) -> list:
+        """Top-n hits per query: [[{'id','text','meta','score'}, ...], ...]."""
+        results = []
+        for q in np.atleast_2d(query_vecs).astype(np.float32, copy=False):
+            rows = np.sort(self._shortlist(q, n, nprobe or self.nprobe))  # sorted rows read the memmap in order
+            exact = np.asarray(self.base.embeddings[rows], dtype=np.float32) @ q
+            best = top_k(exact, n)
+            results.append([self.base.hit(rows[i], exact[i], with_embeddings) for i in best])
+        return results
+
+    def get(self, ids: list) -> list:
+        return self.base.get(ids)
+
+    def resident_bytes(self) -> int:
+        """RAM held by the index itself (the float vectors stay on disk)."""
+        return sum(a.nbytes for a in (self.centroids, self.codebooks, self.codes,
+                                      self.list_rows, self.offsets))
+
@@ -0,0 +1,195 @@
+"""
+Streaming corpus loaders for scripts/build_index.py.
+
+Every loader yields records ``{'doc_id', 'text', 'meta', 'query'}`` one at a
+time, so a dump far larger than RAM can be indexed.  ``query`` is a short
+question or title used only for the build-time recall reports.
+
+    pubmedqa     the HuggingFace PubMedQA dataset (needs network on first use)
+    jsonl        local .jsonl / .jsonl.gz files, one JSON object per line
+    parquet      local .parquet files, read in row batches
+    pubmed-xml   PubMed baseline / update dumps (.xml or .xml.gz)
+
+A path may be a file, a directory or a glob; several files are read in name
+order.
+"""
+
+from pathlib import Path
+import glob
+import gzip
+import hashlib
+import json
+import os
+import zlib
+
+_DEFAULT_ID_FIELDS = ("id", "pmid", "pubid", "doc_id")
+_DEFAULT_TEXT_FIELDS = ("title", "abstract", "text")
+
+
+class Corpus:
+    """A re-iterable stream of records plus what identifies this version of it."""
+
+    def __init__(self, name: str, records, fingerprint: str, size: int | None = None):
+        self.name = name
+        self._records = records
+        self.fingerprint = fingerprint
+        self.size = size
+
+    def __iter__(self):
+        return iter(self._records())
+
+
+def in_shard(doc_id: str, shard: tuple | None) -> bool:
+    """Whether a document belongs to shard (i, n); stable across runs and machines."""
+    if shard is None:
+        return True
+    i, n = shard
+    return zlib.crc32(doc_id.encode("utf-8")) % n == i
+
+
+def _expand(path: str, suffixes: tuple) -> list:
+    p = Path(path)
+    if p.is_dir():
+        files = [f for f in p.rglob("*") if f.name.endswith(suffixes)]
+    else:
+        files = [Path(f) for f in glob.glob(path)]
+    if not files:
+        raise FileNotFoundError(f"No {'/'.join(suffixes)} files at {path}")
+    return sorted(files)
+
+
+def _files_fingerprint(files: list) -> str:
+    h = hashlib.sha1()
+    for f in files:
+        st = os.stat(f)
+        h.update(f"{f}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _open(path: Path):
+    return gzip.open(path, "rt", encoding="utf-8") if path.name.endswith(".gz") else open(path, encoding="utf-8")
+
+
+def _from_fields(row: dict, source: str, id_fields, text_fields, meta_fields) -> dict | None:
+    """Map a flat row (JSONL line / Parquet row) to a record; None if it has no id or text."""
+    doc_id = next((row[f] for f in id_fields if row.get(f) not in (None, "")), None)
+    parts = [row[f] if isinstance(row[f], str) else " ".join(map(str, row[f]))
+             for f in text_fields if row.get(f)]
+    if doc_id is None or not parts:
+        return None
+    doc_id = str(doc_id)
+    meta = {'source': str(row.get('source') or source), 'pmid': doc_id}
+    for f in meta_fields:
+        if isinstance(row.get(f), (str, int, float, bool)):
+            meta[f] = row[f]
+    return {'doc_id': doc_id, 'text': " ".join(parts), 'meta': meta,
+            'query': row.get('question') or row.get('title') or parts[0][:200]}
+
+
+# ─── Loaders ────────────────────────────────────────────────────────────────
+
+def pubmedqa(subset: str = "pqa_labeled") -> Corpus:
+    from datasets import load_dataset
+
+    dataset = load_dataset("qiaojin/PubMedQA", subset, split="train")
+
+    def _records():
+        for item in dataset:
+            pmid = str(item['pubid'])
+            yield {
+                'doc_id': pmid,
+                'text':   item['question'] + " " + " ".join(item['context']['contexts']),
+                'meta':   {'source': 'PubMedQA', 'pmid': pmid},
+                'query':  item['question'],
+            }
+
+    fingerprint = getattr(dataset, "_fingerprint", None) or f"{subset}:{len(dataset)}"
+    return Corpus(f"PubMedQA ({subset})", _records, fingerprint, size=len(dataset))
+
+
+def jsonl(path: str, id_fields=_DEFAULT_ID_FIELDS, text_fields=_DEFAULT_TEXT_FIELDS,
+          meta_fields=()) -> Corpus:
+    files = _expand(path, (".jsonl", ".jsonl.gz"))
+
+    def _records():
+        for f in files:
+            source = f.name.split(".")[0]
+            with _open(f) as lines:
+                for line in lines:
+                    if line.strip():
+                        record = _from_fields(json.loads(line), source, id_fields, text_fields, meta_fields)
+                        if record is not None:
+                            yield record
+
+    return Corpus(f"JSONL ({len(files)} files)", _records, _files_fingerprint(files))
+
+
+def parquet(path: str, id_fields=_DEFAULT_ID_FIELDS, text_fields=_DEFAULT_TEXT_FIELDS,
+            meta_fields=(), batch_size: int = 1024) -> Corpus:
+    import pyarrow.parquet as pq
+
+    files = _expand(path, (".parquet",))
+    size = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+
+    def _records():
+        for f in files:
+            source = f.name.split(".")[0]
+            for batch in pq.ParquetFile(f).iter_batches(batch_size=batch_size):
+                for row in batch.to_pylist():
+                    record = _from_fields(row, source, id_fields, text_fields, meta_fields)
+                    if record is not None:
+                        yield record
+
+    return Corpus(f"Parquet ({len(files)} files)", _records, _files_fingerprint(files), size=size)
+
+
+def pubmed_xml(path: str) -> Corpus:
+    """PubmedArticle records with an abstract; each element is freed once read."""
+    import xml.etree.ElementTree as ET
+
+    files = _expand(path, (".xml", ".xml.gz"))
+
+    def _article(elem) -> dict | None:
+        pmid = elem.findtext("MedlineCitation/PMID")
+        article = elem.find("MedlineCitation/Article")
+        if not pmid or article is None:
+            return None
+        title_elem = article.find("ArticleTitle")
+        title = "".join(title_elem.itertext()).strip() if title_elem is not None else ""
+        sections = []
+        for part in article.findall("Abstract/AbstractText"):
+            text = "".join(part.itertext()).strip()
+            label = part.get("Label")
+            if text:
+                sections.append(f"{label}: {text}" if label else text)
+        if not sections:
+            return None
+        meta = {'source': 'PubMed', 'pmid': pmid}
+        journal = article.findtext("Journal/Title")
+        if journal:
+            meta['journal'] = journal
+        year = article.findtext("Journal/JournalIssue/PubDate/Year")
+        if year:
+            meta['year'] = int(year)
+        return {'doc_id': pmid, 'text': " ".join([title] + sections).strip(), 'meta': meta,
+                'query': title or sections[0][:200]}
+
+    def _records():
+        for f in files:
+            opener = gzip.open if f.name.endswith(".gz") else open
+            with opener(f, "rb") as stream:
+                root = None
+                for event, elem in ET.iterparse(stream, events=("start", "end")):
+                    if root is None:
+                        root = elem
+                    if event != "end" or elem.tag != "PubmedArticle":
+                        continue
+                    record = _article(elem)
+                    root.clear()  # drop every finished article, not just its contents
+                    if record is not None:
+                        yield record
+
+    return Corpus(f"PubMed XML ({len(files)} files)", _records, _files_fingerprint(files))
+
+
+LOADERS = {"pubmedqa": pubmedqa, "jsonl": jsonl, "parquet": parquet, "pubmed-xml": pubmed_xml}
@@ -0,0 +1,134 @@
+"""
+Content-hash manifest of what is in the index, for incremental rebuilds.
+
+Chunk IDs are deterministic (``<doc id>-<chunk index>``), so re-indexing a
+document overwrites its chunks in place.  The manifest records, per document,
+the hash of the text it was indexed from, how many chunks it produced and
+which collection holds them; scripts/build_index.py embeds only documents
+whose hash changed, deletes the leftover chunks of documents that shrank, and
+deletes documents that are gone from the corpus.
+
+The settings the index was built with (model, chunking, shard key) are stored
+too: if they change, every document counts as changed, but the chunk counts
+are kept so stale chunks can still be deleted.
+
+During a build, changes are appended to a journal next to the manifest and
+fsynced after every write batch (`commit()`), so an interrupted build loses
+nothing it already wrote; `save()` folds the journal into the manifest.
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+
+
+def chunk_id(doc_id: str, index: int) -> str:
+    return f"{doc_id}-{index}"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    """doc id -> {'hash', 'chunks', 'collection'}, saved as JSON next to the index."""
+
+    def __init__(self, path: Path, settings: dict):
+        self.path = Path(path)
+        self.settings = settings
+        self.documents = {}
+        self.settings_changed = False
+        self.journal_path = self.path.with_suffix(".journal")
+        self._journal = None
+        self._pending = []
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            self.documents = data.get("documents", {})
+            if data.get("settings") != settings:
+                self.settings_changed = True
+                self.invalidate()
+        if self.journal_path.exists():
+            self._replay()
+
+    def _replay(self) -> None:
+        """Apply the journal of an interrupted build."""
+        with open(self.journal_path) as f:
+            lines = f.read().splitlines()
+        other_settings = False
+        for line in lines:
+            try:
+                change = json.loads(line)
+            except ValueError:  # torn last line of a crash
+                break
+            if "settings" in change:
+                other_settings = change["settings"] != self.settings
+                self.settings_changed |= other_settings
+            elif change["entry"] is None:
+                self.documents.pop(change["id"], None)
+            else:
+                self.documents[change["id"]] = {**change["entry"], **({"hash": None} if other_settings else {})}
+
+    def invalidate(self) -> None:
+        """Treat every document as changed on this build (e.g. a forced re-embed)."""
+        with self._lock:
+            for entry in self.documents.values():
+                entry["hash"] = None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def get(self, doc_id: str) -> dict | None:
+        with self._lock:
+            return self.documents.get(doc_id)
+
+    def is_current(self, doc_id: str, digest: str) -> bool:
+        entry = self.get(doc_id)
+        return entry is not None and entry["hash"] == digest
+
+    def record(self, doc_id: str, digest: str, chunks: int, collection: str) -> dict | None:
+        """Store a document's new state; returns its previous entry (or None)."""
+        with self._lock:
+            previous = self.documents.get(doc_id)
+            self.documents[doc_id] = {"hash": digest, "chunks": chunks, "collection": collection}
+            self._pending.append({"id": doc_id, "entry": self.documents[doc_id]})
+            return previous
+
+    def remove(self, doc_id: str) -> dict | None:
+        with self._lock:
+            self._pending.append({"id": doc_id, "entry": None})
+            return self.documents.pop(doc_id, None)
+
+    def commit(self) -> None:
+        """Durably journal the changes made since the last commit."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._journal is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fresh = not self.journal_path.exists()
+                self._journal = open(self.journal_path, "a")
+                if fresh:
+                    pending.insert(0, {"settings": self.settings})
+            for change in pending:
+                self._journal.write(json.dumps(change) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def save(self) -> None:
+        """Write atomically, so a crash never leaves a half-written manifest,
+        then drop the journal it now includes."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp, "w") as f:
+                json.dump({"settings": self.settings, "documents": self.documents}, f)
+            os.replace(tmp, self.path)
+            self._pending = []
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self.journal_path.exists():
+                os.remove(self.journal_path)
@@ -0,0 +1,39 @@
+"""
+Maximal Marginal Relevance selection.
+
+PubMedQA often returns several abstracts that say nearly the same thing.  MMR
+picks evidence greedily, trading relevance to the query against similarity to
+what is already picked, so near-duplicates stop eating prompt slots.
+"""
+
+import numpy as np
+
+
+def mmr_select(relevance: np.ndarray, embeddings: np.ndarray, k: int,
+               lambda_: float = 0.7) -> list:
+    """Indices of k candidates chosen by MMR, in selection order.
+
+    ``relevance`` is each candidate's score for the query and ``embeddings``
+    their unit-normalised vectors; redundancy is read from one (n, n) cosine
+    similarity matrix.  ``lambda_`` = 1 is pure relevance, 0 pure diversity.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    relevance = np.asarray(relevance, dtype=np.float32)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    sim = embeddings @ embeddings.T
+
+    selected = [int(np.argmax(relevance))]
+    max_sim = sim[selected[0]].copy()
+    chosen = np.zeros(n, dtype=bool)
+    chosen[selected[0]] = True
+    while len(selected) < k:
+        mmr = lambda_ * relevance - (1 - lambda_) * max_sim
+        mmr[chosen] = -np.inf
+        nxt = int(np.argmax(mmr))
+        selected.append(nxt)
+        chosen[nxt] = True
+        np.maximum(max_sim, sim[nxt], out=max_sim)
+    return selected
@@ -0,0 +1,235 @@
+"""
+Exact in-process vector index on memory-mapped NumPy files.
+
+Layout of an index directory:
+    embeddings.npy   (n, dim) unit-normalised float32 or float16, memory-mapped
+    documents.bin    concatenated UTF-8 JSON records {"id", "text", "meta"}
+    offsets.npy      int64 (n + 1,) byte offsets of each record in documents.bin
+    id_hashes.npy    uint64 sorted 64-bit hashes of the record ids
+    id_rows.npy      int64 row of each entry of id_hashes.npy
+    meta.json        {"model", "dim", "dtype", "count"}
+
+Search is one matrix-vector product per query block plus ``argpartition``,
+which for corpora of this size beats Chroma's SQLite + HNSW round-trip and is
+exact.  Only the top-k records are ever decoded, and lookups by id are a
+binary search of the memory-mapped id hashes.
+
+An index is written into a sibling temp directory that replaces the old one
+only when complete, so files a running app has memory-mapped are never
+truncated or rewritten under it.
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Rows scored per block; bounds the float32 temporary when the index is float16.
+_BLOCK = 65536
+
+
+def _id_hash(id_: str) -> int:
+    return int.from_bytes(hashlib.blake2b(id_.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class DocStore:
+    """Read-only records file addressed through an offsets sidecar."""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        self._offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        size = int(self._offsets[-1])
+        self._data = np.memmap(path / "documents.bin", dtype=np.uint8, mode="r") if size else b""
+        self._id_hashes = self._id_rows = self._row_of = None
+        if (path / "id_hashes.npy").exists():
+            self._id_hashes = np.load(path / "id_hashes.npy", mmap_mode="r")
+            self._id_rows = np.load(path / "id_rows.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> dict:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(bytes(self._data[start:end]).decode("utf-8"))
+
+    def rows(self, ids: list) -> list:
+        """Rows of the given ids, in order; unknown ids are skipped."""
+        if self._id_hashes is None:
+            # Written before the id sidecar: decode every record once.
+            if self._row_of is None:
+                self._row_of = {self[i]["id"]: i for i in range(len(self))}
+            return [self._row_of[i] for i in ids if i in self._row_of]
+        hashes = np.array([_id_hash(i) for i in ids], dtype=np.uint64)
+        starts = np.searchsorted(self._id_hashes, hashes)
+        rows = []
+        for id_, h, j in zip(ids, hashes, starts):
+            # Equal hashes are adjacent; the record's own id settles a collision.
+            while j < len(self._id_hashes) and self._id_hashes[j] == h:
+                row = int(self._id_rows[j])
+                if self[row]["id"] == id_:
+                    rows.append(row)
+                    break
+                j += 1
+        return rows
+
+
+class DocStoreWriter:
+    """Append records to documents.bin; offsets.npy and the id sidecar are written on close()."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path / "documents.bin", "wb")
+        self._offsets = [0]
+        self._hashes = []
+
+    def add(self, record: dict) -> None:
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        self._f.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        self._hashes.append(_id_hash(record["id"]))
+
+    def close(self) -> None:
+        self._f.close()
+        np.save(self.path / "offsets.npy", np.asarray(self._offsets, dtype=np.int64))
+        hashes = np.asarray(self._hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        np.save(self.path / "id_hashes.npy", hashes[order])
+        np.save(self.path / "id_rows.npy", order.astype(np.int64))
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def evaluate_recall(index, reference, queries: np.ndarray, k: int = 10) -> dict:
+    """recall@k of ``index`` against ``reference`` (any backend) and its mean latency.
+
+    Queries are issued one at a time, as the app does.  Returns
+    ``{'recall', 'ms_per_query'}``.
+    """
+    truth = [{h["id"] for h in hits} for hits in reference.query(queries, k)]
+    t0 = time.perf_counter()
+    found = [index.query(q, k)[0] for q in np.atleast_2d(queries)]
+    elapsed = time.perf_counter() - t0
+    recall = np.mean([len(t & {h["id"] for h in f}) / max(1, len(t)) for t, f in zip(truth, found)])
+    return {"recall": float(recall), "ms_per_query": 1000 * elapsed / max(1, len(found))}
+
+
+class NumpyIndex:
+    """Exact dot-product search over a memory-mapped embedding matrix."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.embeddings = np.load(self.path / "embeddings.npy", mmap_mode="r")
+        self.docs = DocStore(self.path)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def scores(self, query_vecs: np.ndarray) -> np.ndarray:
+        """(m, n) cosine scores of each query against every document."""
+        q = np.atleast_2d(query_vecs).astype(np.float32, copy=False)
+        out = np.empty((len(q), len(self)), dtype=np.float32)
+        for start in range(0, len(self), _BLOCK):
+            block = np.asarray(self.embeddings[start:start + _BLOCK], dtype=np.float32)
+            out[:, start:start + len(block)] = q @ block.T
+        return out
+
+    def hit(self, row: int, score: float, with_embedding: bool = False) -> dict:
+        rec = self.docs[row]
+        hit = {"id": rec["id"], "text": rec["text"], "meta": rec.get("meta") or {}, "score": float(score)}
+        if with_embedding:
+            hit["embedding"] = np.asarray(self.embeddings[row], dtype=np.float32)
+        return hit
+
+    def query(self, query_vecs: np.ndarray, n: int, with_embeddings: bool = False) -> list:
+        """Top-n hits per query: [[{'id','text','meta','score'}, ...], ...]."""
+        results = []
+        for row_scores in self.scores(query_vecs):
+            rows = top_k(row_scores, n)
+            results.append([self.hit(r, row_scores[r], with_embeddings) for r in rows])
+        return results
+
+    def get(self, ids: list) -> list:
+        """Records (with embeddings) for the given ids; unknown ids are skipped."""
+        return [self.hit(r, 0.0, with_embedding=True) for r in self.docs.rows(ids)]
+
+
+class NumpyIndexWriter:
+    """Stream (id, text, meta, vector) batches into a NumpyIndex directory.
+
+    Everything is written to ``<path>.tmp``, which replaces ``path`` on close().
+    """
+
+    def __init__(self, path: Path, model: str, dtype: str = "float32"):
+        self.path = Path(path)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        self._tmp.mkdir(parents=True)
+        self.model = model
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self.count = 0
+        self._raw_path = self._tmp / "embeddings.raw.tmp"
+        self._raw = open(self._raw_path, "wb")
+        self._docs = DocStoreWriter(self._tmp)
+
+    def add(self, ids: list, texts: list, metas: list, vectors: np.ndarray) -> None:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        self._raw.write(np.ascontiguousarray(vectors.astype(self.dtype)).tobytes())
+        for id_, text, meta in zip(ids, texts, metas):
+            self._docs.add({"id": id_, "text": text, "meta": meta or {}})
+        self.count += len(vectors)
+
+    def close(self) -> None:
+        self._raw.close()
+        self._docs.close()
+        if self.count:
+            # The row count is only known now, so copy the raw stream under a .npy header.
+            raw = np.memmap(self._raw_path, dtype=self.dtype, mode="r", shape=(self.count, self.dim))
+            out = np.lib.format.open_memmap(
+                self._tmp / "embeddings.npy", mode="w+", dtype=self.dtype, shape=(self.count, self.dim)
+            )
+            for start in range(0, self.count, _BLOCK):
+                out[start:start + _BLOCK] = raw[start:start + _BLOCK]
+            out.flush()
+            del raw, out
+        else:
+            np.save(self._tmp / "embeddings.npy", np.empty((0, 0), dtype=self.dtype))
+        os.remove(self._raw_path)
+        with open(self._tmp / "meta.json", "w") as f:
+            json.dump({"model": self.model, "dim": self.dim, "dtype": self.dtype.name, "count": self.count}, f)
+        # Unlinking the old files leaves a running app's memory maps intact; it
+        # switches to the new index when the version stamp is bumped afterwards.
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+
+
+def export_from_chroma(collection, path: Path, model: str, dtype: str = "float32",
+                       page: int = 1000) -> int:
+    """Copy every record of a Chroma collection into a NumpyIndex directory."""
+    writer = NumpyIndexWriter(path, model, dtype)
+    total = collection.count()
+    for offset in range(0, total, page):
+        res = collection.get(
+            limit=page, offset=offset, include=["embeddings", "documents", "metadatas"]
+        )
+        writer.add(res["ids"], res["documents"], res["metadatas"], np.asarray(res["embeddings"]))
+    writer.close()
+    return writer.count
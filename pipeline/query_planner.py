@@ -0,0 +1,50 @@
+"""
+Query planner: turns a patient case into several retrieval sub-queries.
+
+The chief complaint alone misses the evidence that matters for drug
+interactions and comorbidities, so each listed medication and each history
+condition gets its own sub-query with a small quota of evidence slots.
+"""
+
+import re
+
+_SPLIT_RE = re.compile(r"[,;\n]+")
+_EMPTY = {"", "none", "nil", "n/a", "na", "nkda", "no", "-"}
+
+
+def split_items(text: str) -> list:
+    """Split a free-text list field ("Metformin 500mg, Lisinopril") into items."""
+    items, seen = [], set()
+    for item in _SPLIT_RE.split(text or ""):
+        item = " ".join(item.split()).strip(" .")
+        if item.lower() in _EMPTY or item.lower() in seen:
+            continue
+        seen.add(item.lower())
+        items.append(item)
+    return items
+
+
+def plan_queries(patient_data: dict, complaint_quota: int, medication_quota: int = 1,
+                 history_quota: int = 1, max_queries: int = 6) -> list:
+    """Sub-queries for a case, most important first.
+
+    Each is ``{'field', 'text', 'quota'}``; quota is how many evidence chunks
+    that sub-query may contribute to the merged result.
+    """
+    complaint = patient_data["chief_complaint"].strip()
+    plan = [{'field': 'chief_complaint', 'text': complaint, 'quota': complaint_quota}]
+
+    meds = split_items(patient_data.get("medications", ""))
+    history = split_items(patient_data.get("history", ""))
+    if medication_quota > 0:
+        plan += [
+            {'field': 'medications', 'text': f"{med} drug interactions and adverse effects",
+             'quota': medication_quota}
+            for med in meds
+        ]
+    if history_quota > 0:
+        plan += [
+            {'field': 'history', 'text': f"{condition} {complaint}", 'quota': history_quota}
+            for condition in history
+        ]
+    return plan[:max_queries]
@@ -0,0 +1,108 @@
+"""
+Cross-encoder re-ranking of retrieved candidates.
+
+Vector search orders candidates by how close two independently computed
+embeddings are; a cross-encoder reads query and passage together and is a
+much better judge of relevance.  All uncached (query, passage) pairs are
+scored in one batched forward pass, pair scores are kept in an LRU keyed by
+(query hash, document id), and the pass must finish within a latency budget
+-- if it does not, the candidates keep their cosine order and the scores are
+still cached when the pass completes.  Callers are told when that happened,
+so they do not cache the degraded result.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import hashlib
+import threading
+
+from pipeline.embedding_cache import normalize_text
+
+_CONFIGURED = object()  # sentinel: use the reranker's own latency budget
+
+
+class CrossEncoderReranker:
+    """Batched cross-encoder scoring with a pair-score LRU and a latency budget."""
+
+    def __init__(self, model_name: str, batch_size: int = 16,
+                 cache_size: int = 4096, budget_ms: float | None = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.budget = budget_ms / 1000.0 if budget_ms else None
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._scores: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # One scoring pass at a time; a pass that overruns its budget keeps running here.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self.timeouts = 0
+
+    def get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name)
+            return self._model
+
+    def _score(self, pairs: list) -> dict:
+        """Score (query key, query, hit) pairs in one batch; cache and return
+        them as {(query key, hit id): score}."""
+        scores = self.get_model().predict(
+            [(query, hit['text']) for _, query, hit in pairs], batch_size=self.batch_size
+        )
+        fresh = {(key, hit['id']): float(score) for (key, _, hit), score in zip(pairs, scores)}
+        with self._lock:
+            self._scores.update(fresh)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+        return fresh
+
+    def rerank(self, query: str, hits: list, budget=_CONFIGURED) -> tuple:
+        """Return (hits sorted by cross-encoder score, each with a 'rerank_score',
+        True), or (the hits unchanged, False) if scoring missed the budget.
+
+        ``budget`` (seconds) overrides the configured latency budget; ``None``
+        waits for scoring however long it takes.
+        """
+        (ranked,), complete = self.rerank_many([query], [hits], budget)
+        return ranked, complete
+
+    def rerank_many(self, queries: list, hit_lists: list, budget=_CONFIGURED) -> tuple:
+        """rerank() for several queries at once: every uncached (query, hit) pair
+        is scored in one batched pass under one budget.
+
+        Returns (one hit list per query, complete); if the pass misses the
+        budget, every list is returned unchanged and complete is False.
+        """
+        if not any(hit_lists):
+            return list(hit_lists), True
+        budget = self.budget if budget is _CONFIGURED else budget
+        self.get_model()  # loading is not part of the budget
+
+        keys = [hashlib.sha1(normalize_text(q).encode("utf-8")).hexdigest() for q in queries]
+        scores, missing = {}, {}
+        with self._lock:
+            for key, query, hits in zip(keys, queries, hit_lists):
+                for h in hits:
+                    score = self._scores.get((key, h['id']))
+                    if score is None:
+                        missing[(key, h['id'])] = (key, query, h)
+                    else:
+                        scores[(key, h['id'])] = score
+                        self._scores.move_to_end((key, h['id']))
+        if missing:
+            future = self._executor.submit(self._score, list(missing.values()))
+            try:
+                scores.update(future.result(timeout=budget))
+            except TimeoutError:
+                self.timeouts += 1
+                return list(hit_lists), False
+
+        ranked = []
+        for key, hits in zip(keys, hit_lists):
+            reranked = [{**h, 'rerank_score': scores[(key, h['id'])]} for h in hits]
+            reranked.sort(key=lambda h: h['rerank_score'], reverse=True)
+            ranked.append(reranked)
+        return ranked, True
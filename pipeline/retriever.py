@@ -1,6 +1,22 @@
-import chromadb
-from pipeline.embedder import embed_text
+from pipeline.embedder import embed_stream, embed_text, embed_texts
+from pipeline.embedding_cache import normalize_text
+from pipeline.bm25 import BM25Index, reciprocal_rank_fusion
+from pipeline.mmr import mmr_select
+from pipeline.query_planner import plan_queries
+from pipeline.reranker import _CONFIGURED, CrossEncoderReranker
+from pipeline.shard_router import ShardRouter
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable, Iterator
+import asyncio
+import itertools
+import os
+import threading
+import time
+import warnings
+import weakref
+import numpy as np
 import yaml
 
 _CONFIG_PATH = Path(__file__).parent.parent / "config.yaml"
@@ -10,34 +26,749 @@ with open(_CONFIG_PATH) as f:
 # Resolve chroma_path relative to the project root (not CWD)
 _PROJECT_ROOT = Path(__file__).parent.parent
 _chroma_path = str(_PROJECT_ROOT / config['chroma_path'].lstrip("./"))
+_version_path = _PROJECT_ROOT / config['index_version_path'].lstrip("./")
+_bm25_path = _PROJECT_ROOT / config['bm25_path'].lstrip("./")
 
-client = chromadb.PersistentClient(path=_chroma_path)
-collection = client.get_or_create_collection(config['collection_name'])
+# Embeddings are unit-normalised, so cosine distance gives score = 1 - distance.
+COLLECTION_CONFIGURATION = {"hnsw": {"space": "cosine"}}
 
-def retrieve(query: str, k: int = None) -> list:
-    """Retrieve top-k chunks from ChromaDB, then re-rank to rerank_top_k."""
+_client = None
+_collection = None
+_collection_lock = threading.Lock()
+_backend = None
+_backend_kind = None
+_backend_stamp = None  # _stamp() of its files when it was opened
+_backend_lock = threading.Lock()
+_bm25 = None
+_bm25_loaded = False
+_bm25_stamp = None
+_bm25_lock = threading.Lock()
+_reranker = None
+_reranker_lock = threading.Lock()
+_loaded_version = None
+_async_state = weakref.WeakKeyDictionary()  # event loop -> pooled async client state
+
+# Runs the vector query while the calling thread does the lexical lookup.
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieve")
+# Separate pool for per-shard queries, which may themselves run on `_pool`.
+_shard_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieve-shard")
+
+
+def read_index_version() -> str:
+    """Current index version stamp ("" if the index was never built)."""
+    try:
+        return _version_path.read_text().strip()
+    except OSError:
+        return ""
+
+
+def bump_index_version(path: Path | None = None) -> str:
+    """Mark the index as changed; called by scripts/build_index.py after every write.
+
+    ``path`` stamps another index (e.g. a --shard partial build) instead of the live one.
+    """
+    path = path or _version_path
+    version = f"{time.time_ns()}-{os.getpid()}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(version)
+    os.replace(tmp, path)
+    return version
+
+
+class ResultCache:
+    """Bounded LRU of final chunk lists with a TTL, keyed by query + index version."""
+
+    def __init__(self, max_entries: int = 512, ttl_s: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> list | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_s:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [dict(c) for c in entry[1]]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, chunks: list) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), [dict(c) for c in chunks])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits":     self.hits,
+                "misses":   self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "size":     len(self._entries),
+            }
+
+
+_result_cache = ResultCache(
+    max_entries = config.get('result_cache_size', 512),
+    ttl_s       = config.get('result_cache_ttl_s', 3600),
+)
+
+
+def result_cache_stats() -> dict:
+    """Hit rate and size of the retrieval result cache."""
+    return _result_cache.stats()
+
+
+def _stamp(path: Path):
+    """Identity of an index file: changes whenever the index is rewritten."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _backend_files(kind: str) -> list:
+    """Files whose change means a `retriever_backend` of this kind must be reopened
+    (each index writes its meta.json last); none for a Chroma collection."""
+    numpy_meta = _PROJECT_ROOT / config['numpy_index_path'].lstrip("./") / "meta.json"
+    if kind == 'chroma':
+        if config.get('shard_routing', False):
+            return [_PROJECT_ROOT / config['shard_centroids_path'].lstrip("./")]
+        return []
+    if kind == 'numpy':
+        return [numpy_meta]
+    if kind == 'ivfpq':
+        return [_PROJECT_ROOT / config['ivf_path'].lstrip("./") / "meta.json", numpy_meta]
+    if kind == 'binary':
+        return [_PROJECT_ROOT / config['binary_index_path'].lstrip("./") / "meta.json", numpy_meta]
+    return []
+
+
+def _current_version() -> str:
+    """Read the index version (a result-cache key); when it moves, reopen only
+    the file-backed indexes whose own files changed.
+
+    build_index.py bumps the version after every write batch, but BM25 and the
+    NumPy-based backends are only rewritten at the end of a build, if at all.
+    """
+    global _loaded_version, _backend, _bm25, _bm25_loaded
+    version = read_index_version()
+    if version != _loaded_version:
+        with _backend_lock:
+            if _backend is not None and _backend_stamp != [_stamp(p) for p in _backend_files(_backend_kind)]:
+                _backend = None
+        with _bm25_lock:
+            if _bm25_loaded and _bm25_stamp != _stamp(_bm25_path / "meta.json"):
+                _bm25, _bm25_loaded = None, False
+        _loaded_version = version
+    return version
+
+
+def _cached(key: tuple, compute) -> list:
+    """Run ``compute() -> (chunks, cacheable)`` through the result cache.
+
+    The index version is read on every call, cache or not, so file-backed
+    indexes are reopened after a rebuild.  Results degraded by a re-rank
+    timeout are returned but not cached.
+    """
+    key = key + (_current_version(),)
+    use_cache = config.get('result_cache_size', 512) > 0
+    chunks = _result_cache.get(key) if use_cache else None
+    if chunks is None:
+        chunks, cacheable = compute()
+        if use_cache and cacheable:
+            _result_cache.put(key, chunks)
+    return chunks
+
+
+def get_client():
+    """Open the Chroma client on first use (chromadb is imported lazily).
+
+    Embedded PersistentClient by default; an HttpClient when `chroma_host` is set.
+    """
+    global _client
+    with _collection_lock:
+        if _client is None:
+            import chromadb
+
+            if config.get('chroma_host'):
+                _client = chromadb.HttpClient(
+                    host=config['chroma_host'],
+                    port=config.get('chroma_port', 8000),
+                    ssl=config.get('chroma_ssl', False),
+                )
+            else:
+                _client = chromadb.PersistentClient(path=_chroma_path)
+        return _client
+
+
+def get_collection():
+    """The main Chroma collection, created if missing."""
+    global _collection
+    client = get_client()
+    with _collection_lock:
+        if _collection is None:
+            _collection = client.get_or_create_collection(
+                config['collection_name'], configuration=COLLECTION_CONFIGURATION
+            )
+        return _collection
+
+
+def _query_include(with_embeddings: bool) -> list:
+    return ['documents', 'metadatas', 'distances'] + (['embeddings'] if with_embeddings else [])
+
+
+def _query_hits(results: dict, with_embeddings: bool) -> list:
+    """Per-query hit lists from a Chroma ``query`` result (sync or async client)."""
+    out = []
+    for q, (ids, docs, metas, dists) in enumerate(zip(
+        results['ids'], results['documents'], results['metadatas'], results['distances']
+    )):
+        hits = [
+            {'id': id_, 'text': doc, 'meta': meta or {}, 'score': 1 - dist}
+            for id_, doc, meta, dist in zip(ids, docs, metas, dists)
+        ]
+        if with_embeddings:
+            for hit, emb in zip(hits, results['embeddings'][q]):
+                hit['embedding'] = np.asarray(emb, dtype=np.float32)
+        out.append(hits)
+    return out
+
+
+def _get_hits(results: dict) -> list:
+    """Hits carrying their embeddings from a Chroma ``get`` result."""
+    return [
+        {'id': id_, 'text': doc, 'meta': meta or {}, 'embedding': np.asarray(emb, dtype=np.float32)}
+        for id_, doc, meta, emb in zip(
+            results['ids'], results['documents'], results['metadatas'], results['embeddings']
+        )
+    ]
+
+
+_GET_INCLUDE = ['documents', 'metadatas', 'embeddings']
+
+
+class ChromaBackend:
+    """Adapts a Chroma collection to the retriever backend interface.
+
+    Every backend exposes ``query(query_vecs, n, with_embeddings=False)``
+    returning, per query, a best-first list of hits ``{'id', 'text', 'meta',
+    'score'}`` where score is cosine similarity (plus ``'embedding'`` when
+    asked for), and ``get(ids)`` returning hits carrying an ``'embedding'``
+    instead of a score.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def query(self, query_vecs, n: int, with_embeddings: bool = False) -> list:
+        results = self.collection.query(query_embeddings=query_vecs, n_results=n,
+                                        include=_query_include(with_embeddings))
+        return _query_hits(results, with_embeddings)
+
+    def get(self, ids: list) -> list:
+        if not ids:
+            return []
+        return _get_hits(self.collection.get(ids=ids, include=_GET_INCLUDE))
+
+
+class ShardedChromaBackend:
+    """Routes each query to its closest shard collections and merges by score.
+
+    Queries routed to the same shard are sent together as one multi-embedding
+    query; different shards are queried in parallel threads.
+    """
+
+    def __init__(self, client, router: ShardRouter, shards_per_query: int = 2):
+        self.router = router
+        self.shards_per_query = shards_per_query
+        self.shards = {name: ChromaBackend(client.get_collection(name)) for name in router.names}
+
+    def query(self, query_vecs, n: int, with_embeddings: bool = False) -> list:
+        query_vecs = np.atleast_2d(query_vecs)
+        routes = self.router.route(query_vecs, self.shards_per_query)
+        by_shard = {}
+        for q, shards in enumerate(routes):
+            for name in shards:
+                by_shard.setdefault(name, []).append(q)
+
+        futures = {
+            name: _shard_pool.submit(self.shards[name].query, query_vecs[qs], n, with_embeddings)
+            for name, qs in by_shard.items()
+        }
+        merged = [[] for _ in range(len(query_vecs))]
+        for name, qs in by_shard.items():
+            for q, hits in zip(qs, futures[name].result()):
+                merged[q].extend(hits)
+        return [sorted(hits, key=lambda h: h['score'], reverse=True)[:n] for hits in merged]
+
+    def get(self, ids: list) -> list:
+        if not ids:
+            return []
+        futures = [_shard_pool.submit(shard.get, ids) for shard in self.shards.values()]
+        return [hit for fut in futures for hit in fut.result()]
+
+
+def make_backend(kind: str):
+    """A new vector backend of the given `retriever_backend` kind."""
+    numpy_path = _PROJECT_ROOT / config['numpy_index_path'].lstrip("./")
+    if kind == 'chroma' and config.get('shard_routing', False):
+        return ShardedChromaBackend(
+            get_client(),
+            ShardRouter(_PROJECT_ROOT / config['shard_centroids_path'].lstrip("./")),
+            shards_per_query=config.get('shards_per_query', 2),
+        )
+    if kind == 'chroma':
+        return ChromaBackend(get_collection())
+    if kind == 'numpy':
+        from pipeline.numpy_index import NumpyIndex
+        return NumpyIndex(numpy_path)
+    if kind == 'ivfpq':
+        from pipeline.ivfpq import IVFPQIndex
+        from pipeline.numpy_index import NumpyIndex
+        return IVFPQIndex(
+            _PROJECT_ROOT / config['ivf_path'].lstrip("./"),
+            NumpyIndex(numpy_path),
+            nprobe=config.get('ivf_nprobe', 16),
+            rescore=config.get('ivf_rescore', 100),
+        )
+    if kind == 'binary':
+        from pipeline.binary_index import BinaryIndex
+        from pipeline.numpy_index import NumpyIndex
+        return BinaryIndex(
+            _PROJECT_ROOT / config['binary_index_path'].lstrip("./"),
+            NumpyIndex(numpy_path),
+            rescore=config.get('binary_rescore', 200),
+        )
+    raise ValueError(f"Unknown retriever_backend: {kind!r}")
+
+
+def get_backend():
+    """The vector backend selected by `retriever_backend` in config.yaml."""
+    global _backend, _backend_kind, _backend_stamp
+    with _backend_lock:
+        if _backend is None:
+            _backend_kind = config.get('retriever_backend', 'chroma')
+            # Stamped before opening, so a rewrite during the open is picked up next time.
+            _backend_stamp = [_stamp(p) for p in _backend_files(_backend_kind)]
+            _backend = make_backend(_backend_kind)
+        return _backend
+
+
+def get_bm25() -> BM25Index | None:
+    """The lexical index, or None if hybrid search is off or the index is not built."""
+    global _bm25, _bm25_loaded, _bm25_stamp
+    with _bm25_lock:
+        if not _bm25_loaded:
+            _bm25_loaded = True
+            _bm25_stamp = _stamp(_bm25_path / "meta.json")
+            if _bm25_stamp is not None:
+                _bm25 = BM25Index(_bm25_path)
+            else:
+                warnings.warn(f"hybrid_search is on but no BM25 index at {_bm25_path}; "
+                              "run scripts/build_index.py. Using vector search only.")
+        return _bm25
+
+
+def get_reranker() -> CrossEncoderReranker | None:
+    """The cross-encoder reranker, or None when `rerank_model` is not set."""
+    global _reranker
+    if not config.get('rerank_model'):
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker(
+                config['rerank_model'],
+                batch_size = config.get('rerank_batch_size', 16),
+                cache_size = config.get('rerank_cache_size', 4096),
+                budget_ms  = config.get('rerank_budget_ms'),
+            )
+        return _reranker
+
+
+def _rerank_many(queries: list, hit_lists: list, timings: dict | None, budget=_CONFIGURED) -> tuple:
+    """Cross-encoder re-rank of each query's hits, all pairs in one batch under one
+    budget: the reranker's own by default, or ``budget`` seconds (None waits for
+    scoring however long it takes).
+
+    Returns (hit lists, complete); complete is False when the re-ranker fell
+    back to the candidate order.
+    """
+    reranker = get_reranker()
+    if reranker is None:
+        return hit_lists, True
+    t0 = time.perf_counter()
+    hit_lists, complete = reranker.rerank_many(queries, hit_lists, budget)
+    if timings is not None:
+        timings["Re-rank"] = timings.get("Re-rank", 0.0) + time.perf_counter() - t0
+    return hit_lists, complete
+
+
+def _rerank(query: str, hits: list, timings: dict | None, budget=_CONFIGURED) -> tuple:
+    """_rerank_many() for one query: (hits, complete)."""
+    (hits,), complete = _rerank_many([query], [hits], timings, budget)
+    return hits, complete
+
+
+def _diversify(hits: list, k: int) -> list:
+    """Keep k hits: MMR over their embeddings when `mmr_lambda` is set, else the top k.
+
+    Relevance is the cross-encoder score when the hits were re-ranked, else cosine,
+    min-max scaled to [0, 1] per query: cross-encoder logits span about -10..10,
+    and unscaled they would swamp the cosine redundancy term.
+    """
+    lambda_ = config.get('mmr_lambda')
+    if lambda_ is None or len(hits) <= k or any('embedding' not in h for h in hits):
+        return hits[:k]
+    relevance = np.array([h.get('rerank_score', h['score']) for h in hits], dtype=np.float32)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+    picked = mmr_select(relevance, np.stack([h['embedding'] for h in hits]), k, lambda_)
+    return [hits[i] for i in picked]
+
+
+def _candidates(queries: list, query_vecs: np.ndarray, n: int) -> list:
+    """Best-first candidate hits per query: one multi-embedding vector search,
+    fused with BM25 via RRF when hybrid search is enabled.  Hits carry their
+    embeddings when MMR is on."""
+    backend = get_backend()
+    with_embeddings = config.get('mmr_lambda') is not None
+    bm25 = get_bm25() if config.get('hybrid_search', False) else None
+    if bm25 is None:
+        return [
+            sorted(hits, key=lambda h: h['score'], reverse=True)
+            for hits in backend.query(query_vecs, n, with_embeddings)
+        ]
+
+    dense_future = _pool.submit(backend.query, query_vecs, n, with_embeddings)
+    lexical = [bm25.search(query, config.get('bm25_top_k', n)) for query in queries]
+    dense_lists = dense_future.result()
+
+    orders, missing = _fusion_orders(dense_lists, lexical, n)
+    fetched = {h['id']: h for h in backend.get(missing)}
+    return _assemble(orders, dense_lists, fetched, query_vecs, with_embeddings)
+
+
+def _fusion_orders(dense_lists: list, lexical: list, n: int) -> tuple:
+    """RRF-fused id order per query, plus the lexical-only ids that still need fetching."""
+    orders = [
+        reciprocal_rank_fusion(
+            [[h['id'] for h in dense], [id_ for id_, _ in lex]],
+            k=config.get('rrf_k', 60),
+        )[:n]
+        for dense, lex in zip(dense_lists, lexical)
+    ]
+    found = {h['id'] for dense in dense_lists for h in dense}
+    missing = list(dict.fromkeys(id_ for order in orders for id_ in order if id_ not in found))
+    return orders, missing
+
+
+def _assemble(orders: list, dense_lists: list, fetched: dict,
+              query_vecs: np.ndarray, with_embeddings: bool) -> list:
+    """Hits in fused order; lexical-only hits get a cosine score too, for display and MMR."""
+    results = []
+    for order, dense, vec in zip(orders, dense_lists, query_vecs):
+        by_id = {h['id']: h for h in dense}
+        hits = []
+        for id_ in order:
+            if id_ in by_id:
+                hits.append(by_id[id_])
+            elif id_ in fetched:
+                hit = dict(fetched[id_])
+                hit['score'] = float(np.dot(hit['embedding'], vec))
+                if not with_embeddings:
+                    del hit['embedding']
+                hits.append(hit)
+        results.append(hits)
+    return results
+
+
+def _candidate_count(k: int) -> int:
+    """Chunk windows to fetch so that collapsing them still leaves ~k documents."""
+    return k * max(1, config.get('parent_windows', 1))
+
+
+def _collapse(hits: list) -> list:
+    """Merge chunk windows of the same parent document into one hit.
+
+    Hits keep their best-first order by their best window; each keeps up to
+    `parent_windows` of its best windows, joined in document order.  Hits from
+    an index built without chunking (no parent_id) pass through unchanged.
+    """
+    limit = max(1, config.get('parent_windows', 1))
+    groups = OrderedDict()
+    for hit in hits:
+        parent = hit['meta'].get('parent_id')
+        groups.setdefault(hit['id'] if parent is None else ('parent', parent), []).append(hit)
+    collapsed = []
+    for key, windows in groups.items():
+        best = windows[0]
+        if not isinstance(key, tuple):
+            collapsed.append(best)
+            continue
+        kept = sorted(windows[:limit], key=lambda h: h['meta'].get('chunk_index', 0))
+        collapsed.append({**best, 'id': key[1], 'text': " … ".join(h['text'] for h in kept)})
+    return collapsed
+
+
+def _to_chunk(hit: dict) -> dict:
+    return {
+        'text':   hit['text'],
+        'source': hit['meta'].get('source', 'Unknown'),
+        'score':  round(hit['score'], 3)
+    }
+
+
+def retrieve(query: str, k: int = None, timings: dict | None = None) -> list:
+    """Retrieve top-k candidates (vector, optionally fused with BM25), re-rank
+    them with the cross-encoder and keep rerank_top_k.
+
+    If ``timings`` is given, the re-rank stage's latency is recorded in it
+    under "Re-rank".
+    """
     vector_k   = k or config['vector_top_k']
     rerank_k   = config.get('rerank_top_k', vector_k)
-    query_vec  = embed_text(query)
 
-    results = collection.query(
-        query_embeddings=[query_vec],
-        n_results=vector_k,
-        include=['documents', 'metadatas', 'distances']
+    def _compute():
+        query_vec = embed_text(query)
+        hits = _candidates([query], query_vec[None, :], _candidate_count(vector_k))[0]
+        hits, complete = _rerank(query, hits, timings)
+        return [_to_chunk(hit) for hit in _diversify(_collapse(hits), rerank_k)], complete
+
+    return _cached(("query", normalize_text(query), vector_k, rerank_k), _compute)
+
+
+def retrieve_for_case(patient_data: dict, timings: dict | None = None) -> list:
+    """Retrieve evidence for a whole patient case, not just the chief complaint.
+
+    The query planner derives sub-queries from the complaint, each medication
+    and each history condition.  They are embedded in one batch and searched
+    with one multi-embedding query; each sub-query's hits are re-ranked
+    against that sub-query (every pair in one cross-encoder batch, under one
+    latency budget) and contribute at most its quota of chunks, with
+    duplicates across sub-queries dropped.
+    """
+    rerank_k = config.get('rerank_top_k', config['vector_top_k'])
+    if not config.get('query_fanout', False):
+        return retrieve(patient_data["chief_complaint"], timings=timings)
+
+    plan = plan_queries(
+        patient_data,
+        complaint_quota  = rerank_k,
+        medication_quota = config.get('fanout_medication_quota', 1),
+        history_quota    = config.get('fanout_history_quota', 1),
+        max_queries      = config.get('fanout_max_subqueries', 6),
     )
+    texts = [q['text'] for q in plan]
+    max_chunks = config.get('fanout_max_chunks', rerank_k)
+
+    def _compute():
+        hit_lists = _candidates(texts, embed_texts(texts), _candidate_count(config['vector_top_k']))
+        hit_lists, complete = _rerank_many(texts, hit_lists, timings)
+        chunks, seen = [], set()
+        for sub, hits in zip(plan, hit_lists):
+            hits = [h for h in _collapse(hits) if h['id'] not in seen]
+            for hit in _diversify(hits, sub['quota']):
+                seen.add(hit['id'])
+                chunks.append(_to_chunk(hit))
+        return chunks[:max_chunks], complete
+
+    key = tuple((normalize_text(q['text']), q['quota']) for q in plan)
+    return _cached(("case", key, config['vector_top_k'], max_chunks), _compute)
+
+
+def retrieve_many(queries: Iterable[str], k: int = None,
+                  chunk_size: int = None) -> Iterator[list]:
+    """Bulk version of retrieve() for offline jobs; yields one chunk list per
+    query, in input order.
+
+    Queries are embedded with the length-bucketed embed_stream and sent to the
+    backend ``chunk_size`` at a time as one multi-embedding query, so 10k
+    queries cost a few dozen forward passes and round-trips instead of 10k of
+    each.  The cross-encoder scores every (query, candidate) pair of a chunk in
+    one batch, and ignores the interactive latency budget.
+    """
+    vector_k   = k or config['vector_top_k']
+    rerank_k   = config.get('rerank_top_k', vector_k)
+    chunk_size = chunk_size or config.get('retrieve_many_chunk_size', 256)
+
+    pending = deque()
+
+    def _texts():
+        for query in queries:
+            pending.append(query)
+            yield query
+
+    vectors = embed_stream(_texts())
+    while True:
+        vecs = list(itertools.islice(vectors, chunk_size))
+        if not vecs:
+            return
+        texts = [pending.popleft() for _ in vecs]
+        _current_version()  # a long job may span a rebuild
+        hit_lists = _candidates(texts, np.stack(vecs), _candidate_count(vector_k))
+        hit_lists, _ = _rerank_many(texts, hit_lists, None, budget=None)
+        for hits in hit_lists:
+            yield [_to_chunk(hit) for hit in _diversify(_collapse(hits), rerank_k)]
+
+
+# ─── Async path (Chroma server) ─────────────────────────────────────────────
+
+async def _async_state_for_loop() -> dict:
+    """Per-event-loop AsyncHttpClient, collection handle and concurrency limit.
+
+    The client's keep-alive HTTP connection pool is bound to the loop it was
+    created on, so one is kept per loop and reused by every call on it.
+    """
+    loop = asyncio.get_running_loop()
+    state = _async_state.get(loop)
+    if state is None:
+        state = {
+            "lock":       asyncio.Lock(),
+            "semaphore":  asyncio.Semaphore(config.get('chroma_max_concurrency', 16)),
+            "collection": None,
+        }
+        _async_state[loop] = state
+    async with state["lock"]:
+        if state["collection"] is None:
+            import chromadb
+
+            client = await chromadb.AsyncHttpClient(
+                host=config['chroma_host'],
+                port=config.get('chroma_port', 8000),
+                ssl=config.get('chroma_ssl', False),
+            )
+            state["collection"] = await client.get_or_create_collection(
+                config['collection_name'], configuration=COLLECTION_CONFIGURATION
+            )
+    return state
+
+
+async def _with_deadline(state: dict, call, deadline: float):
+    """Run ``await call()`` under the concurrency limit with a per-attempt
+    timeout, retrying transport errors and timeouts with backoff, never past
+    ``deadline`` (loop time)."""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    retries = config.get('chroma_retries', 2)
+    per_call = config.get('chroma_timeout_s', 1.0)
+    for attempt in range(retries + 1):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Chroma query deadline exceeded")
+        try:
+            async with state["semaphore"]:
+                return await asyncio.wait_for(call(), timeout=min(per_call, remaining))
+        except (asyncio.TimeoutError, httpx.TransportError):
+            if attempt == retries:
+                raise
+            await asyncio.sleep(min(0.05 * 2 ** attempt, max(deadline - loop.time(), 0)))
+
+
+class AsyncChromaBackend:
+    """ChromaBackend over an AsyncHttpClient collection, with awaitable
+    ``query`` / ``get``.  Each request runs under the event loop's concurrency
+    limit with retries, never past ``deadline`` (loop time)."""
+
+    def __init__(self, state: dict, deadline: float):
+        self.state = state
+        self.collection = state["collection"]
+        self.deadline = deadline
+
+    async def query(self, query_vecs, n: int, with_embeddings: bool = False) -> list:
+        results = await _with_deadline(self.state, lambda: self.collection.query(
+            query_embeddings=query_vecs, n_results=n, include=_query_include(with_embeddings)
+        ), self.deadline)
+        return _query_hits(results, with_embeddings)
+
+    async def get(self, ids: list) -> list:
+        if not ids:
+            return []
+        results = await _with_deadline(
+            self.state, lambda: self.collection.get(ids=ids, include=_GET_INCLUDE), self.deadline
+        )
+        return _get_hits(results)
+
+
+async def _acandidates(queries: list, query_vecs: np.ndarray, n: int, backend: AsyncChromaBackend,
+                       bm25: BM25Index | None = None) -> list:
+    """_candidates() against an AsyncChromaBackend, fused with ``bm25`` if given;
+    BM25 runs in a worker thread while the vector query is in flight."""
+    with_embeddings = config.get('mmr_lambda') is not None
+    dense_task = asyncio.ensure_future(backend.query(query_vecs, n, with_embeddings))
+    if bm25 is None:
+        return [sorted(hits, key=lambda h: h['score'], reverse=True) for hits in await dense_task]
+
+    try:
+        lexical = [await asyncio.to_thread(bm25.search, query, config.get('bm25_top_k', n)) for query in queries]
+    except BaseException:
+        dense_task.cancel()
+        raise
+    dense_lists = await dense_task
+
+    orders, missing = _fusion_orders(dense_lists, lexical, n)
+    fetched = {h['id']: h for h in await backend.get(missing)}
+    return _assemble(orders, dense_lists, fetched, query_vecs, with_embeddings)
+
+
+async def aretrieve(query: str, k: int = None, timeout: float = None,
+                    timings: dict | None = None) -> list:
+    """Async retrieve() against a Chroma server, returning the same chunks.
+
+    The whole call runs within a deadline of ``timeout`` seconds (default
+    `chroma_deadline_s`): embedding, BM25 and the Chroma requests raise
+    asyncio.TimeoutError past it, and re-ranking gets the time left as its
+    budget, falling back to the candidate order when that runs out.  Chroma
+    requests go through a pooled keep-alive AsyncHttpClient with bounded
+    concurrency, a per-request timeout and retries.  Embedding, BM25 and
+    re-ranking run in worker threads.  Without `chroma_host` (embedded local
+    dev), or with another backend, this simply runs retrieve() in a thread.
+    """
+    if (not config.get('chroma_host') or config.get('retriever_backend', 'chroma') != 'chroma'
+            or config.get('shard_routing', False)):
+        return await asyncio.to_thread(retrieve, query, k, timings)
+
+    vector_k = k or config['vector_top_k']
+    rerank_k = config.get('rerank_top_k', vector_k)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or config.get('chroma_deadline_s', 3.0))
+
+    # As in _cached(): the version is read on every call, and degraded results are not cached.
+    key = ("query", normalize_text(query), vector_k, rerank_k, await asyncio.to_thread(_current_version))
+    use_cache = config.get('result_cache_size', 512) > 0
+    cached = _result_cache.get(key) if use_cache else None
+    if cached is not None:
+        return cached
+
+    async def _fetch() -> list:
+        backend = AsyncChromaBackend(await _async_state_for_loop(), deadline)
+        query_vec = await asyncio.to_thread(embed_text, query)
+        # The first call (or one after a rebuild) loads the index from disk.
+        bm25 = await asyncio.to_thread(get_bm25) if config.get('hybrid_search', False) else None
+        return (await _acandidates([query], query_vec[None, :], _candidate_count(vector_k), backend, bm25))[0]
+
+    hits = await asyncio.wait_for(_fetch(), timeout=max(deadline - loop.time(), 0.0))
 
-    chunks = []
-    for doc, meta, dist in zip(
-        results['documents'][0],
-        results['metadatas'][0],
-        results['distances'][0]
-    ):
-        chunks.append({
-            'text':   doc,
-            'source': meta.get('source', 'Unknown'),
-            'score':  round(1 - dist, 3)
-        })
-
-    # Re-rank: sort by cosine similarity score (descending), keep top rerank_k
-    chunks.sort(key=lambda c: c['score'], reverse=True)
-    return chunks[:rerank_k]
\ No newline at end of file
+    # Re-ranking gets what is left of the deadline as its budget, so a late pass
+    # falls back to the candidate order rather than failing the call.
+    reranker = get_reranker()
+    budget = _CONFIGURED
+    if reranker is not None:
+        remaining = max(deadline - loop.time(), 0.0)
+        budget = remaining if reranker.budget is None else min(reranker.budget, remaining)
+    hits, complete = await asyncio.to_thread(_rerank, query, hits, timings, budget)
+    chunks = [_to_chunk(hit) for hit in _diversify(_collapse(hits), rerank_k)]
+    if use_cache and complete:
+        _result_cache.put(key, chunks)
+    return chunks
@@ -0,0 +1,50 @@
+"""
+Background warm-up for the retrieval stack.
+
+Loading BioBERT, opening Chroma and the first forward pass together take
+several seconds.  `start_warmup()` does all three on a daemon thread as soon
+as the app process starts, so the first clinician to press Analyze does not
+pay for it.  It is idempotent: Streamlit reruns the script on every
+interaction, but only the first call starts a thread.
+"""
+
+import threading
+import time
+
+from pipeline.embedder import get_model
+from pipeline.retriever import get_backend, get_reranker
+
+_thread = None
+_lock = threading.Lock()
+_status = {"started_at": None, "seconds": None, "error": None}
+
+
+def _warm() -> None:
+    t0 = time.perf_counter()
+    try:
+        model = get_model()
+        get_backend()
+        reranker = get_reranker()
+        if reranker is not None:
+            reranker.get_model()
+        model.encode("warm-up")  # first forward pass allocates kernels/buffers
+    except Exception as e:  # the first real request will surface it again
+        _status["error"] = repr(e)
+    _status["seconds"] = time.perf_counter() - t0
+
+
+def start_warmup() -> threading.Thread:
+    """Start the warm-up thread once per process and return it."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _status["started_at"] = time.time()
+            _thread = threading.Thread(target=_warm, name="retrieval-warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def warmup_status() -> dict:
+    """Whether warm-up has finished, how long it took and any error it hit."""
+    done = _thread is not None and not _thread.is_alive()
+    return {"done": done, **_status}
@@ -0,0 +1,67 @@
+"""
+Benchmark bulk retrieval: `retrieve_many()` against a Python loop over
+`retrieve()` on the same queries.
+
+Queries come from a newline-separated file, or default to PubMedQA questions.
+The loop is timed on a sample and extrapolated so 10k-query runs stay short.
+The embedding (memory and disk), re-rank pair and result caches are disabled,
+so neither arm reuses work done by the other or by an earlier run.
+
+    python scripts/bench_retrieve_many.py --n 10000
+    python scripts/bench_retrieve_many.py --queries-file queries.txt --loop-sample 200
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline import embedder, retriever
+from pipeline.retriever import retrieve, retrieve_many
+from pipeline.warmup import start_warmup
+import argparse
+import time
+
+
+def _load_queries(args) -> list:
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            return [line.strip() for line in f if line.strip()][:args.n]
+    from datasets import load_dataset
+
+    dataset = load_dataset("qiaojin/PubMedQA", "pqa_artificial", split="train")
+    return dataset.select(range(min(args.n, len(dataset))))["question"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark retrieve_many() vs. a retrieve() loop.")
+    parser.add_argument("--n", type=int, default=10000, help="number of queries")
+    parser.add_argument("--queries-file", help="newline-separated queries")
+    parser.add_argument("--loop-sample", type=int, default=500,
+                        help="queries actually run through the retrieve() loop")
+    args = parser.parse_args()
+
+    queries = _load_queries(args)
+    # Before warm-up, which builds the embedding cache and the reranker.
+    embedder.config.update(embedding_cache_size=0, embedding_cache_disk_size=0)
+    retriever.config.update(rerank_cache_size=0, result_cache_size=0)
+    start_warmup().join()
+
+    t0 = time.perf_counter()
+    count = sum(1 for _ in retrieve_many(queries))
+    bulk_s = time.perf_counter() - t0
+
+    sample = queries[-args.loop_sample:]
+    t0 = time.perf_counter()
+    for query in sample:
+        retrieve(query)
+    loop_s = (time.perf_counter() - t0) * len(queries) / len(sample)
+
+    print(f"retrieve_many: {count} queries in {bulk_s:.1f}s ({count / bulk_s:.0f} q/s)")
+    print(f"retrieve loop: ~{loop_s:.1f}s extrapolated from {len(sample)} queries "
+          f"({len(queries) / loop_s:.0f} q/s)")
+    print(f"speed-up:      {loop_s / bulk_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
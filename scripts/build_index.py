@@ -3,13 +3,30 @@ import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from datasets import load_dataset
-import chromadb
-from pipeline.embedder import embed_batch
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, deque
+from pipeline.artifact import ArtifactWriter
+from pipeline.bm25 import BM25Builder
+from pipeline.embedder import embed_stream, embed_texts, get_model, model_id
+from pipeline.binary_index import BinaryIndex, build_binary_index
+from pipeline.chunker import Chunker
+from pipeline.dedup import MinHashDeduper
+from pipeline.ingest import Stage, drain
+from pipeline.ivfpq import build_ivfpq, IVFPQIndex
+from pipeline.loaders import LOADERS, in_shard, pubmed_xml, pubmedqa
+from pipeline.manifest import IndexManifest, chunk_id, content_hash
+from pipeline.numpy_index import NumpyIndex, evaluate_recall, export_from_chroma
+from pipeline.retriever import COLLECTION_CONFIGURATION, bump_index_version
+from pipeline.shard_router import shard_collection_name, write_centroid_table
 from pathlib import Path
 from tqdm import tqdm
+import argparse
+import itertools
+import json
+import multiprocessing
+import time
+import numpy as np
 import yaml
-import uuid
 
 _PROJECT_ROOT = Path(__file__).parent.parent
 _CONFIG_PATH  = _PROJECT_ROOT / "config.yaml"
@@ -19,27 +36,589 @@ with open(_CONFIG_PATH) as f:
 
 # Resolve chroma_path relative to the project root
 _chroma_path = str(_PROJECT_ROOT / config['chroma_path'].lstrip("./"))
+_bm25_path   = _PROJECT_ROOT / config['bm25_path'].lstrip("./")
+_centroids_path = _PROJECT_ROOT / config['shard_centroids_path'].lstrip("./")
+_numpy_path  = _PROJECT_ROOT / config['numpy_index_path'].lstrip("./")
+_ivf_path    = _PROJECT_ROOT / config['ivf_path'].lstrip("./")
+_binary_path = _PROJECT_ROOT / config['binary_index_path'].lstrip("./")
+_manifest_path = _PROJECT_ROOT / config['index_manifest_path'].lstrip("./")
+_checkpoint_path = _PROJECT_ROOT / config['index_checkpoint_path'].lstrip("./")
+_dedup_path  = _PROJECT_ROOT / config['dedup_path'].lstrip("./")
+_dedup_state_path = _PROJECT_ROOT / config['dedup_state_path'].lstrip("./")
+_version_path = _PROJECT_ROOT / config['index_version_path'].lstrip("./")
 
-print("Loading PubMedQA dataset from HuggingFace...")
-dataset = load_dataset("qiaojin/PubMedQA", "pqa_labeled", split="train")
+BATCH = 50          # chunks per collection.add
+READ_BATCH = 64     # documents per read / preprocess batch
+QUEUE = 4           # batches buffered between two ingestion stages
+SHARD = 512         # chunks per worker task in --workers mode
+RECALL_QUERIES = 200  # questions used for the --ivf / --binary recall reports
 
-client = chromadb.PersistentClient(path=_chroma_path)
-collection = client.get_or_create_collection(config['collection_name'])
 
-BATCH = 50
-items = list(dataset)
+def _batched(iterable, n: int):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, n)):
+        yield batch
 
-print(f"Indexing {len(items)} documents into ChromaDB...")
 
-for i in tqdm(range(0, len(items), BATCH)):
-    batch = items[i:i+BATCH]
-    texts = [
-        item['question'] + " " + " ".join(item['context']['contexts'])
-        for item in batch
-    ]
-    embeds = embed_batch(texts)
-    ids = [str(uuid.uuid4()) for _ in batch]
-    metas = [{'source': 'PubMedQA', 'pmid': str(item['pubid'])} for item in batch]
-    collection.add(documents=texts, embeddings=embeds, ids=ids, metadatas=metas)
+def _changed(docs, chunker: Chunker, manifest: IndexManifest, seen: set, counts: dict,
+             skip: int = 0, shard: tuple | None = None, dedup: MinHashDeduper | None = None,
+             duplicates: dict | None = None):
+    """Yield one record {'id', 'text', 'meta', 'hash', 'position'} per token
+    window of each document that is new or changed since the manifest was
+    written.  ``docs`` are (position, loader record) pairs; documents of other
+    --shard partitions are ignored, and the first ``skip`` were committed by an
+    interrupted build and are only marked as seen.  With ``dedup``, near-duplicates
+    of an earlier document are left out (so any indexed copy is deleted) and
+    listed in ``duplicates`` under the canonical document's id."""
+    for position, doc in docs:
+        pmid = doc['doc_id']
+        if not in_shard(pmid, shard):
+            continue
+        text = doc['text']
+        digest = content_hash(text)
+        canonical = dedup.check(pmid, text, digest) if dedup is not None else None
+        if canonical is not None:
+            duplicates.setdefault(canonical, []).append(pmid)
+            counts['duplicate'] += 1
+            counts['duplicate_chunks'] += len(chunker.split(doc['text']))
+            continue
+        if position < skip:
+            seen.add(pmid)
+            counts['resumed'] += 1
+            continue
+        if manifest.is_current(pmid, digest):
+            seen.add(pmid)
+            counts['unchanged'] += 1
+            continue
+        windows = chunker.split(text)
+        if not windows:
+            continue  # left out of `seen`, so any earlier version is deleted
+        seen.add(pmid)
+        counts['changed' if manifest.get(pmid) else 'new'] += 1
+        for i, window in enumerate(windows):
+            yield {'id': chunk_id(pmid, i), 'text': window, 'hash': digest, 'position': position, 'meta': {
+                **doc['meta'], 'pmid': pmid,
+                'parent_id': pmid, 'chunk_index': i, 'chunk_count': len(windows),
+            }}
 
-print(f"Done! {collection.count()} documents indexed.")
+
+def _parse_shard(spec: str) -> tuple:
+    i, n = (int(x) for x in spec.split("/"))
+    if not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"--shard {spec}: expected i/n with 0 <= i < n")
+    return i, n
+
+
+def _use_shard_paths(shard: tuple) -> Path:
+    """Point every output of this build at its own directory under `build_shards_path`."""
+    global _chroma_path, _bm25_path, _manifest_path, _checkpoint_path, _dedup_path, _dedup_state_path
+    global _centroids_path, _version_path
+    out = _PROJECT_ROOT / config['build_shards_path'].lstrip("./") / f"{shard[0]}-of-{shard[1]}"
+    _chroma_path = str(out / "chroma_db")
+    _bm25_path = out / "bm25"
+    _manifest_path = out / "index_manifest.json"
+    _checkpoint_path = out / "index_checkpoint.json"
+    _dedup_path = out / "dedup.json"
+    _dedup_state_path = out / "dedup_state"
+    # A partial build must not replace the live router table or wake running apps.
+    _centroids_path = out / "shard_centroids.npz"
+    _version_path = out / "index_version"
+    return out
+
+
+# ─── Checkpoint ─────────────────────────────────────────────────────────────
+
+def _load_checkpoint() -> dict | None:
+    try:
+        with open(_checkpoint_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(checkpoint: dict) -> None:
+    _checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _checkpoint_path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _checkpoint_path)
+
+
+def _resume_point(checkpoint: dict | None, expected: dict, chunks_in_index: int) -> int:
+    """Documents to skip for --resume; exits if the checkpoint is for another build."""
+    if checkpoint is None:
+        print("No checkpoint found; starting from the beginning.")
+        return 0
+    for key, value in expected.items():
+        if checkpoint.get(key) != value:
+            sys.exit(f"Checkpoint {_checkpoint_path} was written with {key}={checkpoint.get(key)!r}, "
+                     f"this build has {value!r}; run without --resume.")
+    # The batch in flight when the build stopped may be partly written: allow that much drift.
+    drift = chunks_in_index - checkpoint['chunks_in_index']
+    if abs(drift) > BATCH:
+        sys.exit(f"The index holds {chunks_in_index} chunks but the checkpoint recorded "
+                 f"{checkpoint['chunks_in_index']}; it was modified since. Run without --resume.")
+    if drift:
+        print(f"  {drift:+d} chunks since the checkpoint: the interrupted batch is rewritten.")
+    print(f"Resuming after {checkpoint['documents_done']} documents "
+          f"({checkpoint['batches_committed']} batches committed).")
+    return checkpoint['documents_done']
+
+
+# ─── Index maintenance ──────────────────────────────────────────────────────
+
+def _delete_chunks(collection, doc_id: str, start: int, stop: int) -> None:
+    if stop > start:
+        collection.delete(ids=[chunk_id(doc_id, i) for i in range(start, stop)])
+
+
+def _rebuild_bm25(collections: dict, page: int = 5000) -> BM25Builder:
+    """BM25 over every chunk in the index, including the ones not re-embedded this run."""
+    bm25 = BM25Builder()
+    for collection in collections.values():
+        for offset in range(0, collection.count(), page):
+            res = collection.get(limit=page, offset=offset, include=["documents"])
+            for id_, text in zip(res['ids'], res['documents']):
+                bm25.add(id_, text)
+    return bm25
+
+
+def _record_duplicates(duplicates: dict, manifest: IndexManifest, collection_named, page: int = 200) -> int:
+    """Store each canonical document's near-duplicates in its chunks' metadata
+    ('duplicates': comma-separated ids, 'duplicate_count'), and clear them from
+    documents that no longer have any.  Returns the number of documents updated."""
+    try:
+        with open(_dedup_path) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    by_collection = defaultdict(list)
+    for doc_id in sorted(set(duplicates) | set(previous)):
+        entry = manifest.get(doc_id)
+        if entry is not None:
+            by_collection[entry['collection']].append((doc_id, entry['chunks']))
+
+    updated = 0
+    for name, docs in by_collection.items():
+        collection = collection_named(name)
+        for group in _batched(docs, page):
+            wanted = {chunk_id(doc_id, i): duplicates.get(doc_id, [])
+                      for doc_id, chunks in group for i in range(chunks)}
+            res = collection.get(ids=list(wanted), include=["metadatas"])
+            stale = [id_ for id_, meta in zip(res['ids'], res['metadatas'])
+                     if meta.get('duplicates', "") != ",".join(wanted[id_])]
+            if not stale:
+                continue
+            res = collection.get(ids=stale, include=["embeddings", "documents", "metadatas"])
+            metas = []
+            for id_, meta in zip(res['ids'], res['metadatas']):
+                meta = {k: v for k, v in meta.items() if k not in ('duplicates', 'duplicate_count')}
+                if wanted[id_]:
+                    meta.update(duplicates=",".join(wanted[id_]), duplicate_count=len(wanted[id_]))
+                metas.append(meta)
+            collection.upsert(ids=res['ids'], embeddings=np.asarray(res['embeddings']),
+                              documents=res['documents'], metadatas=metas)
+            updated += len({id_.rsplit("-", 1)[0] for id_ in res['ids']})
+
+    if duplicates:
+        _dedup_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _dedup_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(duplicates, f)
+        os.replace(tmp, _dedup_path)
+    else:
+        _dedup_path.unlink(missing_ok=True)
+    return updated
+
+
+# ─── Worker pool ────────────────────────────────────────────────────────────
+
+def _init_worker(threads: int) -> None:
+    """Pin the worker's intra-op thread count and load the model once."""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+    get_model()
+
+
+def _embed_shard(texts: list) -> tuple:
+    t0 = time.perf_counter()
+    vecs = np.stack(list(embed_stream(texts)))
+    return os.getpid(), vecs, time.perf_counter() - t0
+
+
+def _embed_serial(records):
+    """Yield (record, vec) in input order using this process only."""
+    # embed_stream reads ahead a window of texts; `pending` holds the matching
+    # records until their embeddings come back (in input order).
+    pending = deque()
+
+    def _texts():
+        for record in records:
+            pending.append(record)
+            yield record['text']
+
+    for vec in embed_stream(_texts()):
+        yield pending.popleft(), vec
+
+
+def _embed_parallel(records, workers: int, threads: int, stats: dict):
+    """Yield (record, vec) in input order, embedding shards on a process pool.
+
+    At most 2 x workers shards are in flight, so memory stays bounded no matter
+    how large the dataset is; results are consumed in submission order so the
+    single writer sees documents in dataset order.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    rows = iter(records)
+    in_flight = deque()
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(threads,)) as pool:
+        while True:
+            while len(in_flight) < 2 * workers:
+                shard = list(itertools.islice(rows, SHARD))
+                if not shard:
+                    break
+                in_flight.append((shard, pool.submit(_embed_shard, [r['text'] for r in shard])))
+            if not in_flight:
+                return
+            shard, fut = in_flight.popleft()
+            pid, vecs, secs = fut.result()
+            stats[pid][0] += len(shard)
+            stats[pid][1] += secs
+            yield from zip(shard, vecs)
+
+
+# ─── Embedding artifact ─────────────────────────────────────────────────────
+
+def _export_artifact(collections: dict, manifest: IndexManifest, path: Path, page: int = 1000) -> None:
+    """Write every chunk with its stored vector to a portable artifact (pipeline/artifact.py)."""
+    dtype = config.get('artifact_dtype', 'float16')
+    print(f"Exporting embedding artifact ({dtype}) to {path}...")
+    t0 = time.perf_counter()
+    writer = ArtifactWriter(path, model_id(), dtype, settings=manifest.settings)
+    for name, collection in sorted(collections.items()):
+        for offset in range(0, collection.count(), page):
+            res = collection.get(limit=page, offset=offset, include=["embeddings", "documents", "metadatas"])
+            hashes = []
+            for meta in res['metadatas']:
+                entry = manifest.get(meta.get('parent_id') or meta.get('pmid'))
+                hashes.append(entry['hash'] if entry else None)
+            writer.add(name, res['ids'], res['documents'], res['metadatas'],
+                       np.asarray(res['embeddings']), doc_hashes=hashes)
+    writer.close()
+    print(f"  {writer.count} chunks, {path.stat().st_size / 2**20:.1f} MiB "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+
+# ─── Compressed indexes ─────────────────────────────────────────────────────
+
+def _export_numpy(collection) -> NumpyIndex:
+    print(f"Exporting NumPy index to {_numpy_path}...")
+    export_from_chroma(collection, _numpy_path, model_id(),
+                       config.get('numpy_index_dtype', 'float32'))
+    return NumpyIndex(_numpy_path)
+
+
+def _sampling(docs, sample: list):
+    """Yield ``docs`` unchanged, keeping a fixed random sample of their queries
+    (questions / titles) in ``sample`` for the --ivf / --binary recall reports.
+
+    Reservoir-sampled during the indexing pass, so the corpus is read once.
+    The queries belong to indexed documents; they stand in for real traffic
+    when comparing approximate with exact search, and are not held out.
+    """
+    rng = np.random.default_rng(0)
+    for n, doc in enumerate(docs):
+        if n < RECALL_QUERIES:
+            sample.append(doc['query'])
+        elif (j := rng.integers(0, n + 1)) < RECALL_QUERIES:
+            sample[j] = doc['query']
+        yield doc
+
+
+def _report_size(index, exact: NumpyIndex) -> None:
+    print(f"  resident {index.resident_bytes() / 2**20:.1f} MiB vs "
+          f"{exact.embeddings.nbytes / 2**20:.1f} MiB of float vectors")
+
+
+def _build_ivf(exact: NumpyIndex, queries: np.ndarray) -> None:
+    """Train IVF-PQ over the NumPy index and report recall@10 vs exact per nprobe."""
+    print(f"Training IVF-PQ index on {len(exact)} vectors...")
+    t0 = time.perf_counter()
+    meta = build_ivfpq(exact, _ivf_path, nlist=config.get('ivf_nlist'), m=config.get('ivf_pq_m', 96))
+    ivf = IVFPQIndex(_ivf_path, exact, nprobe=config.get('ivf_nprobe', 16),
+                     rescore=config.get('ivf_rescore', 100))
+    print(f"  {meta['nlist']} lists x {meta['m']} bytes/doc in {time.perf_counter() - t0:.1f}s")
+    _report_size(ivf, exact)
+
+    nprobes = sorted({p for p in (1, 4, 16, 64, config.get('ivf_nprobe', 16)) if p <= meta['nlist']})
+    print("  recall@10 vs exact search:")
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        r = evaluate_recall(ivf, exact, queries, k=10)
+        print(f"    nprobe={nprobe:>3}: recall {r['recall']:.3f}, {r['ms_per_query']:.2f} ms/query")
+
+
+def _build_binary(exact: NumpyIndex, queries: np.ndarray) -> None:
+    """Write sign-bit codes for the NumPy index and report recall@10 vs exact."""
+    print(f"Writing binary index for {len(exact)} vectors...")
+    build_binary_index(exact, _binary_path)
+    binary = BinaryIndex(_binary_path, exact, rescore=config.get('binary_rescore', 200))
+    _report_size(binary, exact)
+    r = evaluate_recall(binary, exact, queries, k=10)
+    print(f"  recall@10 vs exact search: {r['recall']:.3f}, {r['ms_per_query']:.2f} ms/query "
+          f"(rescore {binary.rescore})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Index a medical corpus into ChromaDB.")
+    parser.add_argument("--source", default="pubmedqa", choices=sorted(LOADERS),
+                        help="corpus loader (see pipeline/loaders.py)")
+    parser.add_argument("--path", help="file, directory or glob for the jsonl / parquet / pubmed-xml loaders")
+    parser.add_argument("--subset", default="pqa_labeled",
+                        choices=["pqa_labeled", "pqa_artificial", "pqa_unlabeled"],
+                        help="PubMedQA configuration to index")
+    parser.add_argument("--id-fields", default="id,pmid,pubid,doc_id",
+                        help="jsonl / parquet: first non-empty of these fields is the document id")
+    parser.add_argument("--text-fields", default="title,abstract,text",
+                        help="jsonl / parquet: fields joined into the document text")
+    parser.add_argument("--meta-fields", default="",
+                        help="jsonl / parquet: extra scalar fields kept as metadata (e.g. specialty)")
+    parser.add_argument("--shard", type=_parse_shard, metavar="I/N",
+                        help="build only partition I of N (by document id) into its own directory "
+                             "under `build_shards_path`; combine them with scripts/merge_shards.py")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="embedding processes (each loads its own copy of the model)")
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="torch threads per worker (default: cores / workers)")
+    parser.add_argument("--shard-key",
+                        help="metadata key (e.g. source, specialty) to split documents into one "
+                             "collection per value; enable `shard_routing` in config.yaml to query them")
+    parser.add_argument("--reindex-all", action="store_true",
+                        help="re-embed every document, even those unchanged since the last build")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted build from its checkpoint instead of re-reading "
+                             "the documents it already committed")
+    parser.add_argument("--ivf", action="store_true",
+                        help="also export the NumPy index and build the IVF-PQ index over it "
+                             "(`retriever_backend: ivfpq`)")
+    parser.add_argument("--binary", action="store_true",
+                        help="also export the NumPy index and write sign-bit codes for it "
+                             "(`retriever_backend: binary`)")
+    parser.add_argument("--dedup-threshold", type=float, default=config.get('dedup_threshold'),
+                        help="Jaccard similarity at which a document counts as a near-duplicate of an "
+                             "earlier one and is not indexed (default: `dedup_threshold`; 0 disables)")
+    parser.add_argument("--export-artifact", type=Path, metavar="PATH",
+                        help="also write the whole index (ids, vectors, texts, metadata) to a Parquet "
+                             "artifact; load it elsewhere with scripts/import_artifact.py")
+    args = parser.parse_args()
+    if (args.ivf or args.binary) and args.shard_key:
+        parser.error("--ivf / --binary index the single collection; they cannot be combined with --shard-key")
+    if (args.ivf or args.binary) and args.shard:
+        parser.error("--ivf / --binary are built over the merged index; run them after merge_shards.py")
+    if args.source != "pubmedqa" and not args.path:
+        parser.error(f"--source {args.source} needs --path")
+
+    import chromadb
+
+    if args.source == "pubmedqa":
+        print(f"Loading PubMedQA ({args.subset}) dataset from HuggingFace...")
+        corpus = pubmedqa(args.subset)
+    else:
+        fields = {
+            'id_fields':   args.id_fields.split(","),
+            'text_fields': args.text_fields.split(","),
+            'meta_fields': [f for f in args.meta_fields.split(",") if f],
+        }
+        corpus = pubmed_xml(args.path) if args.source == "pubmed-xml" else LOADERS[args.source](args.path, **fields)
+    if args.shard:
+        out = _use_shard_paths(args.shard)
+        print(f"Building shard {args.shard[0]} of {args.shard[1]} into {out}...")
+
+    client = chromadb.PersistentClient(path=_chroma_path)
+    collections = {}
+
+    def _collection_named(name):
+        if name not in collections:
+            collections[name] = client.get_or_create_collection(
+                name, configuration=COLLECTION_CONFIGURATION
+            )
+        return collections[name]
+
+    def _collection_for(meta):
+        name = config['collection_name']
+        if args.shard_key:
+            name = shard_collection_name(name, meta.get(args.shard_key, "unknown"))
+        return _collection_named(name)
+
+    def _all_collections():
+        if not args.shard_key:
+            return {config['collection_name']: _collection_for({})}
+        prefix = config['collection_name'] + "__"
+        names = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+        return {name: _collection_named(name) for name in names if name.startswith(prefix)}
+
+    manifest = IndexManifest(_manifest_path, {
+        'model': model_id(), 'chunk_size': config['chunk_size'],
+        'chunk_overlap': config['chunk_overlap'], 'shard_key': args.shard_key,
+    })
+    if args.reindex_all:
+        manifest.invalidate()
+    elif manifest.settings_changed:
+        print("Model, chunking or shard key changed since the last build; re-embedding everything.")
+    seen = set()
+    counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'removed': 0, 'resumed': 0,
+              'duplicate': 0, 'duplicate_chunks': 0}
+    dedup = None
+    duplicates = {}  # canonical doc id -> ids of its near-duplicates
+    if args.dedup_threshold:
+        # Documents unchanged since the last build keep their verdict without being signed again.
+        dedup = MinHashDeduper.load(_dedup_state_path, args.dedup_threshold, config.get('dedup_num_perm', 128),
+                                    config.get('dedup_shingle_size', 5))
+
+    build = {'fingerprint': corpus.fingerprint, 'model': model_id(),
+             'settings': manifest.settings, 'shard': list(args.shard) if args.shard else None}
+    checkpoint = _load_checkpoint()
+    # A previous build stopped before refreshing BM25, the centroid table and the
+    # version: redo them even if every document turns out to be current by now.
+    interrupted = checkpoint is not None or manifest.journal_path.exists()
+    skip = 0
+    if args.resume:
+        skip = _resume_point(checkpoint, build, sum(c.count() for c in _all_collections().values()))
+    elif checkpoint is not None:
+        print(f"A previous build stopped after {checkpoint.get('documents_done', 0)} documents; "
+              "pass --resume to skip them.")
+    progress = {'documents_done': skip, 'batches_committed': 0}
+
+    # The encoder truncates at its own max_seq_length, which may be below the tokenizer's limit.
+    chunker = Chunker.from_pretrained(config['embedding_model'], config['chunk_size'], config['chunk_overlap'],
+                                      max_seq_length=get_model().max_seq_length)
+
+    stats = defaultdict(lambda: [0, 0.0])  # pid -> [chunks, busy seconds]
+    if args.workers > 1:
+        threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+        print(f"Embedding with {args.workers} workers x {threads} threads...")
+
+        def _embed(records):
+            return _embed_parallel(records, args.workers, threads, stats)
+    else:
+        _embed = _embed_serial
+
+    def _write(batch):
+        texts  = [record['text'] for record, _ in batch]
+        embeds = np.stack([vec for _, vec in batch])
+        ids    = [record['id'] for record, _ in batch]
+        metas  = [record['meta'] for record, _ in batch]
+        groups = defaultdict(list)
+        for i, meta in enumerate(metas):
+            groups[_collection_for(meta).name].append(i)
+        for name, rows in groups.items():
+            collections[name].upsert(
+                documents  = [texts[i] for i in rows],
+                embeddings = embeds[rows],
+                ids        = [ids[i] for i in rows],
+                metadatas  = [metas[i] for i in rows],
+            )
+        # A document is recorded once its last chunk is written; then drop the
+        # chunks its previous version had beyond the new count (or elsewhere).
+        for record, _ in batch:
+            meta = record['meta']
+            if meta['chunk_index'] != meta['chunk_count'] - 1:
+                continue
+            progress['documents_done'] = max(progress['documents_done'], record['position'] + 1)
+            name = _collection_for(meta).name
+            previous = manifest.record(meta['pmid'], record['hash'], meta['chunk_count'], name)
+            if previous is None:
+                continue
+            if previous['collection'] != name:
+                _delete_chunks(_collection_named(previous['collection']), meta['pmid'], 0, previous['chunks'])
+            else:
+                _delete_chunks(collections[name], meta['pmid'], meta['chunk_count'], previous['chunks'])
+        manifest.commit()
+        progress['batches_committed'] += 1
+        _save_checkpoint({**build, **progress,
+                          'chunks_in_index': sum(c.count() for c in _all_collections().values())})
+        bump_index_version(_version_path)  # invalidates cached retrieval results in running apps
+
+    print(f"Indexing {corpus.name} into ChromaDB "
+          f"({chunker.window}-token windows, stride {chunker.stride}; "
+          f"{len(manifest)} already in the manifest)...")
+    recall_sample = []
+    docs = _sampling(corpus, recall_sample) if args.ivf or args.binary else corpus
+    t0 = time.perf_counter()
+    read = Stage("read", lambda: _batched(enumerate(tqdm(docs, desc="documents", total=corpus.size)), READ_BATCH),
+                 queue_size=QUEUE)
+    preprocess = Stage(
+        "preprocess",
+        lambda batches: (list(_changed(b, chunker, manifest, seen, counts, skip, args.shard, dedup, duplicates))
+                         for b in batches),
+        read, queue_size=QUEUE,
+    )
+    embed = Stage("embed", lambda batches: _batched(_embed(itertools.chain.from_iterable(batches)), BATCH),
+                  preprocess, queue_size=QUEUE)
+    stage_stats = drain("write", embed, _write)
+    elapsed = time.perf_counter() - t0
+    documents = stage_stats[0].items
+    chunks = stage_stats[-1].items
+
+    for pmid in [doc_id for doc_id in manifest.documents if doc_id not in seen]:
+        previous = manifest.remove(pmid)
+        _delete_chunks(_collection_named(previous['collection']), pmid, 0, previous['chunks'])
+        counts['removed'] += 1
+    manifest.save()
+    relabelled = _record_duplicates(duplicates, manifest, _collection_named)
+    if dedup is not None:
+        dedup.save(_dedup_state_path)
+    print(f"{counts['new']} new, {counts['changed']} changed, {counts['unchanged']} unchanged, "
+          f"{counts['removed']} removed documents"
+          + (f" ({counts['resumed']} committed before the resume)." if counts['resumed'] else "."))
+    if dedup is not None:
+        kept = sum(c.count() for c in _all_collections().values())
+        saved = counts['duplicate_chunks'] / max(kept + counts['duplicate_chunks'], 1)
+        print(f"Dropped {counts['duplicate']} near-duplicate documents (Jaccard >= {dedup.threshold}, "
+              f"{dedup.bands} bands x {dedup.rows} rows): {counts['duplicate_chunks']} chunks, "
+              f"{saved:.1%} of the index, not stored; {len(duplicates)} canonical documents "
+              f"({relabelled} metadata updates).")
+
+    changed = interrupted or counts['new'] + counts['changed'] + counts['removed'] + counts['resumed'] > 0
+    if changed or not (_bm25_path / "meta.json").exists():
+        bm25 = _rebuild_bm25(_all_collections())
+        print(f"Writing BM25 index ({len(bm25)} chunks) to {_bm25_path}...")
+        bm25.write(_bm25_path)
+
+    if args.shard_key and changed:
+        shards = _all_collections()
+        print(f"Writing centroid table for {len(shards)} shards to {_centroids_path}...")
+        write_centroid_table(shards, _centroids_path)
+        for name, shard in sorted(shards.items()):
+            print(f"  {name}: {shard.count()} documents")
+    if args.ivf or args.binary:
+        exact = _export_numpy(_collection_for({}))
+        queries = embed_texts(recall_sample)
+        if args.ivf:
+            _build_ivf(exact, queries)
+        if args.binary:
+            _build_binary(exact, queries)
+    if changed or relabelled or args.ivf or args.binary:
+        bump_index_version(_version_path)
+    # Only now is everything derived from the chunks up to date.
+    _checkpoint_path.unlink(missing_ok=True)
+    if args.export_artifact:
+        _export_artifact(_all_collections(), manifest, args.export_artifact)
+
+    total = sum(c.count() for c in _all_collections().values())
+    print(f"Done! {documents} documents read, {chunks} chunks embedded ({total} in the index) "
+          f"in {elapsed:.1f}s ({documents / elapsed:.1f} docs/s).")
+    print("Per-stage throughput (read counts documents, later stages count chunks):")
+    for stage in stage_stats:
+        print(f"  {stage}")
+    for i, (pid, (done, busy)) in enumerate(sorted(stats.items()), 1):
+        print(f"  worker {i} (pid {pid}): {done} chunks, {done / busy:.1f} chunks/s while busy")
+
+
+if __name__ == "__main__":
+    main()
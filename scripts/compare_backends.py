@@ -0,0 +1,109 @@
+"""
+Compare the torch and ONNX embedding backends before switching
+`embedding_backend` in config.yaml.
+
+Each backend is loaded in its own child process so load time and peak RSS are
+measured in isolation.  Reports per-text cosine parity against torch, single
+query latency (p50/p95) and batch throughput.
+
+    python scripts/compare_backends.py
+    python scripts/compare_backends.py --quantization avx512_vnni --texts-file queries.txt
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import resource
+import time
+
+import numpy as np
+
+SAMPLE_TEXTS = [
+    "chest pain radiating to left arm",
+    "shortness of breath on exertion",
+    "fever, productive cough and pleuritic chest pain",
+    "sudden onset severe headache with neck stiffness",
+    "polyuria, polydipsia and unexplained weight loss",
+    "syncope after starting amiodarone and warfarin",
+    "Does metformin increase the risk of lactic acidosis in chronic kidney disease?",
+    "Is laparoscopic cholecystectomy safe in the third trimester of pregnancy?",
+]
+
+
+def _measure(backend: str, quantization: str | None, texts: list, repeats: int) -> dict:
+    from pipeline.embedder import load_model
+
+    t0 = time.perf_counter()
+    model = load_model(backend, quantization)
+    load_s = time.perf_counter() - t0
+
+    model.encode(texts[:1])  # warm-up
+    single = []
+    for _ in range(repeats):
+        for text in texts:
+            t0 = time.perf_counter()
+            model.encode(text)
+            single.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    embeds = model.encode(texts, batch_size=32)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "load_s":   load_s,
+        "p50_ms":   float(np.percentile(single, 50) * 1000),
+        "p95_ms":   float(np.percentile(single, 95) * 1000),
+        "batch_tps": len(texts) / batch_s,
+        "rss_mb":   resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "embeds":   np.asarray(embeds, dtype=np.float32),
+    }
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quantization", default="avx2",
+                        help="onnx dynamic-quantization config (avx2, avx512, avx512_vnni, arm64); "
+                             "'none' compares fp32 ONNX only")
+    parser.add_argument("--texts-file", help="newline-separated texts to embed instead of the samples")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = SAMPLE_TEXTS
+    if args.texts_file:
+        with open(args.texts_file) as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    variants = [("torch", None), ("onnx", None)]
+    if args.quantization.lower() != "none":
+        variants.append(("onnx", args.quantization))
+
+    results = {}
+    for backend, quant in variants:
+        label = backend if not quant else f"{backend}-int8 ({quant})"
+        print(f"Measuring {label}...")
+        # A fresh process per backend keeps RSS numbers independent.
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[label] = pool.submit(_measure, backend, quant, texts, args.repeats).result()
+
+    reference = results["torch"]["embeds"]
+    print(f"\n{'backend':<24}{'load':>8}{'p50':>10}{'p95':>10}{'batch/s':>10}{'peak RSS':>11}{'cos min':>9}{'cos mean':>9}")
+    for label, r in results.items():
+        cos = _cosine(reference, r["embeds"])
+        print(
+            f"{label:<24}{r['load_s']:>7.1f}s{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms"
+            f"{r['batch_tps']:>10.1f}{r['rss_mb']:>9.0f}MB{cos.min():>9.4f}{cos.mean():>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
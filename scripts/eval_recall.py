@@ -0,0 +1,61 @@
+"""
+Recall of the alternative vector backends against the Chroma collection.
+
+Embeds a sample of PubMedQA questions (or the lines of --queries-file), takes
+Chroma's top-k as the reference and reports recall@k, mean latency and
+resident index size for each backend.  Run scripts/build_index.py with
+--ivf / --binary first.
+
+    python scripts/eval_recall.py
+    python scripts/eval_recall.py --backends binary --k 4 --queries 500
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.embedder import embed_texts
+from pipeline.numpy_index import evaluate_recall
+from pipeline.retriever import make_backend
+import argparse
+
+import numpy as np
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "ivfpq", "binary"],
+                        choices=["numpy", "ivfpq", "binary"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="PubMedQA questions to sample")
+    parser.add_argument("--queries-file", help="newline-separated queries instead of PubMedQA questions")
+    args = parser.parse_args()
+
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        from datasets import load_dataset
+
+        dataset = load_dataset("qiaojin/PubMedQA", "pqa_labeled", split="train")
+        rows = np.random.default_rng(0).choice(len(dataset), min(args.queries, len(dataset)), replace=False)
+        texts = [dataset[int(i)]['question'] for i in rows]
+    queries = embed_texts(texts)
+
+    chroma = make_backend("chroma")
+    print(f"recall@{args.k} vs Chroma over {len(texts)} queries:")
+    for kind in args.backends:
+        try:
+            backend = make_backend(kind)
+        except FileNotFoundError as e:
+            print(f"  {kind:>7}: not built ({e.filename})")
+            continue
+        r = evaluate_recall(backend, chroma, queries, k=args.k)
+        size = getattr(backend, "resident_bytes", lambda: backend.embeddings.nbytes)()
+        print(f"  {kind:>7}: recall {r['recall']:.3f}, {r['ms_per_query']:.2f} ms/query, "
+              f"{size / 2**20:.1f} MiB resident")
+
+
+if __name__ == "__main__":
+    main()
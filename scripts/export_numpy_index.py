@@ -0,0 +1,44 @@
+"""
+Export the ChromaDB collection into a memory-mapped NumPy index
+(pipeline/numpy_index.py), usable with `retriever_backend: "numpy"`.
+
+    python scripts/export_numpy_index.py
+    python scripts/export_numpy_index.py --dtype float16 --out data/numpy_index_f16
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.embedder import model_id
+from pipeline.numpy_index import export_from_chroma
+from pipeline.retriever import get_collection
+from pathlib import Path
+import argparse
+import time
+import yaml
+
+_PROJECT_ROOT = Path(__file__).parent.parent
+_CONFIG_PATH  = _PROJECT_ROOT / "config.yaml"
+
+with open(_CONFIG_PATH) as f:
+    config = yaml.safe_load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export ChromaDB to a NumPy vector index.")
+    parser.add_argument("--dtype", default=config.get('numpy_index_dtype', 'float32'),
+                        choices=["float32", "float16"])
+    parser.add_argument("--out", default=config['numpy_index_path'],
+                        help="index directory (relative to the project root)")
+    args = parser.parse_args()
+
+    out = _PROJECT_ROOT / args.out.lstrip("./")
+    t0 = time.perf_counter()
+    count = export_from_chroma(get_collection(), out, model_id(), args.dtype)
+    print(f"Exported {count} documents to {out} ({args.dtype}) in {time.perf_counter() - t0:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Bulk-load an embedding artifact written by `build_index.py --export-artifact`.
+
+Nothing is re-embedded: the stored vectors are upserted into the main Chroma
+store (restoring its collections, index manifest and shard centroids, so the
+next build_index.py run is incremental), or written to the NumPy vector index
+with --to numpy (`retriever_backend: numpy`, or the base of --ivf / --binary).
+The BM25 index is rebuilt from the artifact's texts either way.
+
+    python scripts/build_index.py --export-artifact data/index.parquet     # on the build machine
+    python scripts/import_artifact.py data/index.parquet
+    python scripts/import_artifact.py --to numpy data/index.parquet
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.artifact import read_artifact, read_header
+from pipeline.bm25 import BM25Builder
+from pipeline.embedder import model_id
+from pipeline.manifest import IndexManifest
+from pipeline.numpy_index import NumpyIndexWriter
+from pipeline.retriever import COLLECTION_CONFIGURATION, bump_index_version
+from pipeline.shard_router import write_centroid_table
+from pathlib import Path
+import argparse
+import time
+import yaml
+
+_PROJECT_ROOT = Path(__file__).parent.parent
+_CONFIG_PATH  = _PROJECT_ROOT / "config.yaml"
+
+with open(_CONFIG_PATH) as f:
+    config = yaml.safe_load(f)
+
+_chroma_path   = str(_PROJECT_ROOT / config['chroma_path'].lstrip("./"))
+_bm25_path     = _PROJECT_ROOT / config['bm25_path'].lstrip("./")
+_manifest_path = _PROJECT_ROOT / config['index_manifest_path'].lstrip("./")
+_centroids_path = _PROJECT_ROOT / config['shard_centroids_path'].lstrip("./")
+
+PAGE = 1000         # records per get when rebuilding BM25
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("artifact", type=Path, help="Parquet artifact to load")
+    parser.add_argument("--to", default="chroma", choices=["chroma", "numpy"],
+                        help="load into the main Chroma store or into the NumPy index (`numpy_index_path`)")
+    args = parser.parse_args()
+
+    header = read_header(args.artifact)
+    if header["model"] != model_id():
+        # Queries are embedded with the configured model and backend; other vectors would not match them.
+        sys.exit(f"{args.artifact} holds {header['model']} embeddings, "
+                 f"but config.yaml embeds queries with {model_id()}.")
+    print(f"Loading {header['count']} chunks ({header['dim']}-d {header['dtype']}) from {args.artifact}...")
+
+    t0 = time.perf_counter()
+    if args.to == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=_chroma_path)
+        collections = {}
+        # Entries for documents already in the store are kept (with their hash
+        # cleared if the settings differ), so the next build can still delete them.
+        manifest = IndexManifest(_manifest_path, header["settings"])
+    else:
+        out = _PROJECT_ROOT / config['numpy_index_path'].lstrip("./")
+        writer = NumpyIndexWriter(out, header["model"], config.get('numpy_index_dtype', 'float32'))
+
+    bm25 = BM25Builder()
+    loaded = 0
+    for page in read_artifact(args.artifact):
+        name = page['collection']
+        if args.to == "chroma":
+            if name not in collections:
+                collections[name] = client.get_or_create_collection(name, configuration=COLLECTION_CONFIGURATION)
+            collections[name].upsert(ids=page['ids'], embeddings=page['vectors'],
+                                     documents=page['texts'], metadatas=page['metas'])
+            for meta, digest in zip(page['metas'], page['doc_hashes']):
+                if digest is not None and meta.get('chunk_index', 0) == meta.get('chunk_count', 1) - 1:
+                    manifest.record(meta.get('parent_id') or meta['pmid'], digest,
+                                    meta.get('chunk_count', 1), name)
+        else:
+            writer.add(page['ids'], page['texts'], page['metas'], page['vectors'])
+            for id_, text in zip(page['ids'], page['texts']):
+                bm25.add(id_, text)
+        loaded += len(page['ids'])
+    elapsed = time.perf_counter() - t0
+
+    if args.to == "numpy":
+        writer.close()
+        print(f"Wrote {writer.count} chunks to the NumPy index at {out}.")
+    else:
+        manifest.save()
+        sharded = [n for n in collections if n.startswith(config['collection_name'] + "__")]
+        if sharded:
+            print(f"Writing centroid table for {len(sharded)} shard collections to {_centroids_path}...")
+            write_centroid_table({n: collections[n] for n in sharded}, _centroids_path)
+        print(f"Loaded {loaded} chunks into {len(collections)} collections in {_chroma_path} "
+              f"({len(manifest)} documents in the manifest).")
+        # Over the whole store, so chunks indexed there before the import stay searchable.
+        for collection in collections.values():
+            for offset in range(0, collection.count(), PAGE):
+                res = collection.get(limit=PAGE, offset=offset, include=["documents"])
+                for id_, text in zip(res['ids'], res['documents']):
+                    bm25.add(id_, text)
+
+    print(f"Writing BM25 index ({len(bm25)} chunks) to {_bm25_path}...")
+    bm25.write(_bm25_path)
+    bump_index_version()
+    print(f"Done in {time.perf_counter() - t0:.1f}s ({loaded / max(elapsed, 1e-9):.0f} chunks/s loading).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Measure app cold-start cost so import-time regressions are visible.
+
+Runs each measurement in a fresh interpreter:
+  * import time of the modules app/main.py pulls in, and which heavy
+    dependencies (torch, sentence_transformers, chromadb, groq) they drag in;
+  * warm-up time (model load + collection open + dummy encode);
+  * time-to-first-result for `retrieve()` with and without warm-up, with the
+    disk embedding cache and the result cache off so a query embedded by an
+    earlier run is not served from disk.
+
+    python scripts/measure_startup.py
+    python scripts/measure_startup.py --max-import-ms 500
+
+Exits non-zero if a heavy dependency is imported eagerly or the import
+budget is exceeded.
+"""
+
+import sys
+import os
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, _PROJECT_ROOT)
+
+import argparse
+import json
+import subprocess
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "groq"]
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import pipeline.embedder, pipeline.retriever, pipeline.prompt_builder, pipeline.warmup, inference.llm_client
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"import_s": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+_FIRST_RESULT_PROBE = """
+import json, sys, time
+import pipeline.embedder, pipeline.retriever
+from pipeline.retriever import retrieve
+from pipeline.warmup import start_warmup
+pipeline.embedder.config["embedding_cache_disk_size"] = 0
+pipeline.retriever.config["result_cache_size"] = 0
+out = {}
+if sys.argv[1] == "warm":
+    t0 = time.perf_counter()
+    start_warmup().join()
+    out["warmup_s"] = time.perf_counter() - t0
+t0 = time.perf_counter()
+retrieve(sys.argv[2])
+out["first_result_s"] = time.perf_counter() - t0
+print(json.dumps(out))
+"""
+
+
+def _run(code: str, *args: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", code, *args],
+        cwd=_PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure MediAssist import time and time-to-first-result.")
+    parser.add_argument("--query", default="chest pain radiating to left arm")
+    parser.add_argument("--max-import-ms", type=float, help="fail if import time exceeds this budget")
+    args = parser.parse_args()
+
+    imp = _run(_IMPORT_PROBE)
+    print(f"Import time:                 {imp['import_s']*1000:8.0f} ms")
+    print(f"Heavy modules at import:     {', '.join(imp['loaded']) or 'none'}")
+
+    cold = _run(_FIRST_RESULT_PROBE, "cold", args.query)
+    print(f"First result (no warm-up):   {cold['first_result_s']*1000:8.0f} ms")
+
+    warm = _run(_FIRST_RESULT_PROBE, "warm", args.query)
+    print(f"Warm-up:                     {warm['warmup_s']*1000:8.0f} ms")
+    print(f"First result (after warm-up):{warm['first_result_s']*1000:8.0f} ms")
+
+    if imp["loaded"] or (args.max_import_ms and imp["import_s"] * 1000 > args.max_import_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Merge partial indexes written by `build_index.py --shard i/n` into one.
+
+Each shard directory holds its own Chroma store and manifest.  Every
+collection is copied (stored vectors included, nothing is re-embedded) into
+the main Chroma store, or into one NumPy vector index with --to numpy; the
+manifests are merged and the BM25 index is rebuilt over the result.
+
+A shard is authoritative for its partition of document ids: documents of that
+partition it no longer has, and chunks its documents no longer have (they
+shrank or moved collection), are deleted from the main store.
+
+    python scripts/build_index.py --source pubmed-xml --path dumps/ --shard 0/4   # on each node
+    python scripts/merge_shards.py
+    python scripts/merge_shards.py --to numpy data/build_shards/0-of-4 data/build_shards/1-of-4
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.bm25 import BM25Builder
+from pipeline.embedder import model_id
+from pipeline.loaders import in_shard
+from pipeline.manifest import IndexManifest, chunk_id
+from pipeline.numpy_index import NumpyIndexWriter
+from pipeline.retriever import COLLECTION_CONFIGURATION, bump_index_version
+from pipeline.shard_router import write_centroid_table
+from pathlib import Path
+import argparse
+import json
+import time
+import numpy as np
+import yaml
+
+_PROJECT_ROOT = Path(__file__).parent.parent
+_CONFIG_PATH  = _PROJECT_ROOT / "config.yaml"
+
+with open(_CONFIG_PATH) as f:
+    config = yaml.safe_load(f)
+
+_chroma_path   = str(_PROJECT_ROOT / config['chroma_path'].lstrip("./"))
+_bm25_path     = _PROJECT_ROOT / config['bm25_path'].lstrip("./")
+_manifest_path = _PROJECT_ROOT / config['index_manifest_path'].lstrip("./")
+_centroids_path = _PROJECT_ROOT / config['shard_centroids_path'].lstrip("./")
+_shards_path   = _PROJECT_ROOT / config['build_shards_path'].lstrip("./")
+_dedup_path    = _PROJECT_ROOT / config['dedup_path'].lstrip("./")
+
+PAGE = 1000         # records per get / upsert
+
+
+def _pages(collection, include: list):
+    for offset in range(0, collection.count(), PAGE):
+        yield collection.get(limit=PAGE, offset=offset, include=include)
+
+
+def _partition(shard_dir: Path) -> tuple:
+    """(i, n) of a shard directory, from its `<i>-of-<n>` name."""
+    try:
+        i, n = (int(x) for x in shard_dir.name.split("-of-"))
+    except ValueError:
+        sys.exit(f"{shard_dir}: expected a directory named <i>-of-<n>, as written by build_index.py --shard i/n")
+    return i, n
+
+
+def _merge_manifests(shard_dirs: list) -> tuple:
+    """Fold the shard manifests (built with the same settings) into the main one.
+
+    Returns the merged manifest and the chunks to delete from the main store,
+    as (collection, doc id, first chunk, end) ranges.
+    """
+    merged = None
+    stale = []
+    for shard in shard_dirs:
+        with open(shard / "index_manifest.json") as f:
+            data = json.load(f)
+        if merged is None:
+            merged = IndexManifest(_manifest_path, data["settings"])
+        elif data["settings"] != merged.settings:
+            sys.exit(f"{shard} was built with {data['settings']}, not {merged.settings}.")
+        partition = _partition(shard)
+        documents = data["documents"]
+        for doc_id in [d for d in merged.documents if d not in documents and in_shard(d, partition)]:
+            previous = merged.documents.pop(doc_id)
+            stale.append((previous['collection'], doc_id, 0, previous['chunks']))
+        for doc_id, entry in documents.items():
+            previous = merged.documents.get(doc_id)
+            if previous is not None and previous['collection'] != entry['collection']:
+                stale.append((previous['collection'], doc_id, 0, previous['chunks']))
+            elif previous is not None and previous['chunks'] > entry['chunks']:
+                stale.append((previous['collection'], doc_id, entry['chunks'], previous['chunks']))
+            merged.documents[doc_id] = entry
+    return merged, stale
+
+
+def _merge_duplicates(shard_dirs: list) -> dict:
+    """The main near-duplicate map with each merged shard's partition replaced by the shard's."""
+    try:
+        with open(_dedup_path) as f:
+            duplicates = json.load(f)
+    except (OSError, ValueError):
+        duplicates = {}
+    for shard in shard_dirs:
+        partition = _partition(shard)
+        duplicates = {k: v for k, v in duplicates.items() if not in_shard(k, partition)}
+        if (shard / "dedup.json").exists():
+            with open(shard / "dedup.json") as f:
+                duplicates.update(json.load(f))
+    return duplicates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("shards", nargs="*", type=Path,
+                        help="shard directories (default: every one under `build_shards_path`)")
+    parser.add_argument("--to", default="chroma", choices=["chroma", "numpy"],
+                        help="merge into the main Chroma store or into the NumPy index (`numpy_index_path`)")
+    args = parser.parse_args()
+
+    import chromadb
+
+    shard_dirs = args.shards or sorted(p for p in _shards_path.glob("*-of-*") if p.is_dir())
+    unfinished = [s for s in shard_dirs if (s / "index_checkpoint.json").exists()]
+    if not shard_dirs or unfinished:
+        sys.exit(f"Nothing to merge in {_shards_path}" if not shard_dirs else
+                 f"Unfinished shard builds (resume them first): {', '.join(map(str, unfinished))}")
+
+    t0 = time.perf_counter()
+    if args.to == "chroma":
+        manifest, stale = _merge_manifests(shard_dirs)  # before copying: fails fast on mismatched settings
+        target = chromadb.PersistentClient(path=_chroma_path)
+    else:
+        out = _PROJECT_ROOT / config['numpy_index_path'].lstrip("./")
+        writer = NumpyIndexWriter(out, model_id(), config.get('numpy_index_dtype', 'float32'))
+
+    merged_collections = {}
+    bm25 = BM25Builder()
+    for shard in shard_dirs:
+        client = chromadb.PersistentClient(path=str(shard / "chroma_db"))
+        for c in client.list_collections():
+            name = c if isinstance(c, str) else c.name
+            source = client.get_collection(name)
+            copied = 0
+            for page in _pages(source, ["embeddings", "documents", "metadatas"]):
+                if args.to == "chroma":
+                    if name not in merged_collections:
+                        merged_collections[name] = target.get_or_create_collection(
+                            name, configuration=COLLECTION_CONFIGURATION
+                        )
+                    merged_collections[name].upsert(
+                        ids=page['ids'], embeddings=np.asarray(page['embeddings']),
+                        documents=page['documents'], metadatas=page['metadatas'],
+                    )
+                else:
+                    writer.add(page['ids'], page['documents'], page['metadatas'], np.asarray(page['embeddings']))
+                    for id_, text in zip(page['ids'], page['documents']):
+                        bm25.add(id_, text)
+                copied += len(page['ids'])
+            print(f"  {shard.name}/{name}: {copied} chunks")
+
+    if args.to == "numpy":
+        writer.close()
+        print(f"Wrote {writer.count} chunks to the NumPy index at {out}.")
+    else:
+        # Deleted only now, so a failed copy leaves the main store as it was.
+        for name, doc_id, start, stop in stale:
+            target.get_or_create_collection(name, configuration=COLLECTION_CONFIGURATION).delete(
+                ids=[chunk_id(doc_id, i) for i in range(start, stop)]
+            )
+        manifest.save()
+        # Near-duplicates were only detected within each shard.
+        duplicates = _merge_duplicates(shard_dirs)
+        if duplicates:
+            with open(_dedup_path, "w") as f:
+                json.dump(duplicates, f)
+        else:
+            _dedup_path.unlink(missing_ok=True)
+
+        # The whole index in the main store, including collections no merged shard touched.
+        prefix = config['collection_name']
+        names = [c if isinstance(c, str) else c.name for c in target.list_collections()]
+        collections = {n: target.get_collection(n) for n in names if n == prefix or n.startswith(prefix + "__")}
+        sharded = [n for n in collections if n.startswith(prefix + "__")]
+        if sharded:
+            print(f"Writing centroid table for {len(sharded)} shard collections to {_centroids_path}...")
+            write_centroid_table({n: collections[n] for n in sharded}, _centroids_path)
+        total = sum(c.count() for c in collections.values())
+        print(f"Merged {len(shard_dirs)} shard builds into {_chroma_path} ({total} chunks; "
+              f"{sum(stop - start for _, _, start, stop in stale)} stale chunks deleted).")
+        for collection in collections.values():
+            for page in _pages(collection, ["documents"]):
+                for id_, text in zip(page['ids'], page['documents']):
+                    bm25.add(id_, text)
+
+    print(f"Writing BM25 index ({len(bm25)} chunks) to {_bm25_path}...")
+    bm25.write(_bm25_path)
+    bump_index_version()
+    print(f"Done in {time.perf_counter() - t0:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
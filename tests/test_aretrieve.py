@@ -0,0 +1,178 @@
+"""
+aretrieve() against an in-process stand-in for chromadb.AsyncHttpClient.
+
+The stand-in serves an in-memory collection through the async client API,
+and the same collection through ChromaBackend for the sync path, so every
+test can check that aretrieve() returns exactly what retrieve() does.
+
+    python -m unittest tests.test_aretrieve
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pathlib import Path
+from unittest import mock
+import asyncio
+import tempfile
+import time
+import types
+import unittest
+import zlib
+
+import numpy as np
+
+from pipeline import retriever
+
+DIM = 8
+
+
+class _Collection:
+    """Brute-force cosine search over a few unit vectors, Chroma-shaped results."""
+
+    def __init__(self, n: int = 20, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        vecs = rng.standard_normal((n, DIM)).astype(np.float32)
+        self.vecs = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+        self.ids = [f"doc{i}" for i in range(n)]
+        self.docs = [f"abstract {i} about topic {i % 4}" for i in range(n)]
+        self.metas = [{'source': f"PMID{i}"} for i in range(n)]
+
+    def query(self, query_embeddings, n_results, include):
+        out = {'ids': [], 'documents': [], 'metadatas': [], 'distances': [], 'embeddings': []}
+        for q in np.atleast_2d(query_embeddings):
+            sims = self.vecs @ q
+            top = np.argsort(-sims)[:n_results]
+            out['ids'].append([self.ids[i] for i in top])
+            out['documents'].append([self.docs[i] for i in top])
+            out['metadatas'].append([self.metas[i] for i in top])
+            out['distances'].append([float(1 - sims[i]) for i in top])
+            out['embeddings'].append([self.vecs[i] for i in top])
+        return out
+
+    def get(self, ids, include):
+        rows = [self.ids.index(id_) for id_ in ids]
+        return {
+            'ids':        [self.ids[i] for i in rows],
+            'documents':  [self.docs[i] for i in rows],
+            'metadatas':  [self.metas[i] for i in rows],
+            'embeddings': [self.vecs[i] for i in rows],
+        }
+
+
+class _AsyncCollection:
+    def __init__(self, collection: _Collection, delay: float = 0.0):
+        self.collection = collection
+        self.delay = delay
+        self.calls = 0
+
+    async def query(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.collection.query(**kwargs)
+
+    async def get(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.collection.get(**kwargs)
+
+
+def _fake_chromadb(async_collection: _AsyncCollection) -> types.ModuleType:
+    class _Client:
+        async def get_or_create_collection(self, name, configuration=None):
+            return async_collection
+
+    async def AsyncHttpClient(host, port, ssl):
+        return _Client()
+
+    return types.SimpleNamespace(AsyncHttpClient=AsyncHttpClient)
+
+
+class _BM25:
+    """Keyword stand-in that ranks documents the vector search does not return."""
+
+    def __init__(self, ids: list):
+        self.ids = ids
+
+    def search(self, query: str, n: int) -> list:
+        return [(id_, 1.0 / (rank + 1)) for rank, id_ in enumerate(reversed(self.ids))][:n]
+
+
+def _embed(text: str) -> np.ndarray:
+    vec = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIM).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class ARetrieveTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.collection = _Collection()
+        self.async_collection = _AsyncCollection(self.collection)
+
+        patches = [
+            mock.patch.dict(retriever.config, {
+                'chroma_host': "localhost", 'retriever_backend': "chroma", 'shard_routing': False,
+                'vector_top_k': 5, 'rerank_top_k': 3, 'rerank_model': None, 'mmr_lambda': None,
+                'hybrid_search': False, 'result_cache_size': 0, 'parent_windows': 1,
+                'chroma_deadline_s': 2.0, 'chroma_timeout_s': 1.0, 'chroma_retries': 0,
+            }),
+            mock.patch.dict(sys.modules, {'chromadb': _fake_chromadb(self.async_collection)}),
+            mock.patch.object(retriever, '_version_path', Path(tmp.name) / "index_version"),
+            mock.patch.object(retriever, 'embed_text', _embed),
+            mock.patch.object(retriever, 'get_backend', lambda: retriever.ChromaBackend(self.collection)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_matches_sync_retrieve(self):
+        query = "chest pain radiating to left arm"
+        chunks = await retriever.aretrieve(query)
+        self.assertEqual(chunks, await asyncio.to_thread(retriever.retrieve, query))
+        self.assertEqual(len(chunks), 3)
+
+    async def test_hybrid_fetches_keyword_only_hits(self):
+        bm25 = _BM25(self.collection.ids)
+        with mock.patch.dict(retriever.config, {'hybrid_search': True, 'mmr_lambda': 0.7}), \
+                mock.patch.object(retriever, 'get_bm25', lambda: bm25):
+            query = "shortness of breath"
+            chunks = await retriever.aretrieve(query)
+            self.assertEqual(chunks, await asyncio.to_thread(retriever.retrieve, query))
+        self.assertEqual(self.async_collection.calls, 2)  # the vector query, then a get of the keyword-only ids
+
+    async def test_deadline_covers_embedding(self):
+        def slow_embed(text):
+            time.sleep(0.3)
+            return _embed(text)
+
+        with mock.patch.object(retriever, 'embed_text', slow_embed):
+            with self.assertRaises(asyncio.TimeoutError):
+                await retriever.aretrieve("fever", timeout=0.1)
+
+    async def test_deadline_covers_chroma_requests(self):
+        self.async_collection.delay = 0.3
+        with self.assertRaises(asyncio.TimeoutError):
+            await retriever.aretrieve("fever", timeout=0.1)
+
+    async def test_late_rerank_falls_back_and_is_not_cached(self):
+        class SlowModel:
+            def predict(self, pairs, batch_size=16):
+                time.sleep(0.3)
+                return [float(len(text)) for _, text in pairs]
+
+        reranker = retriever.CrossEncoderReranker("stand-in", budget_ms=None)
+        reranker._model = SlowModel()
+        with mock.patch.dict(retriever.config, {'result_cache_size': 16}), \
+                mock.patch.object(retriever, 'get_reranker', lambda: reranker):
+            t0 = time.perf_counter()
+            await retriever.aretrieve("fever", timeout=0.15)
+            self.assertLess(time.perf_counter() - t0, 0.3)
+            self.assertEqual(retriever.result_cache_stats()['size'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
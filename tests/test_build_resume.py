@@ -0,0 +1,194 @@
+"""
+scripts/build_index.py interrupted and run again, against an in-process
+stand-in for chromadb.PersistentClient.
+
+The stand-in keeps each collection in memory, and can be told to fail a
+write; embeddings and tokenisation are replaced by deterministic stand-ins
+so the build runs without a model.  Every test checks that the re-run
+leaves the collection, the BM25 index, the version and the checkpoint as a
+build that was never interrupted would.
+
+    python -m unittest tests.test_build_resume
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from pathlib import Path
+from unittest import mock
+import io
+import json
+import re
+import tempfile
+import types
+import unittest
+import zlib
+
+import numpy as np
+
+import build_index
+from pipeline.bm25 import BM25Index
+from pipeline.chunker import Chunker
+from pipeline.manifest import chunk_id
+
+DIM = 8
+
+
+class _Collection:
+    """Upsert / delete / count / get over an in-memory dict, in insertion order."""
+
+    def __init__(self, name: str, client: "_Client"):
+        self.name = name
+        self.client = client
+        self.rows = {}  # id -> (document, embedding, metadata)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.client.upserts += 1
+        if self.client.fail_at == self.client.upserts:
+            raise RuntimeError("stand-in crash during upsert")
+        for id_, vec, text, meta in zip(ids, embeddings, documents, metadatas):
+            self.rows[id_] = (text, np.asarray(vec), dict(meta))
+
+    def delete(self, ids):
+        for id_ in ids:
+            self.rows.pop(id_, None)
+
+    def count(self) -> int:
+        return len(self.rows)
+
+    def get(self, ids=None, limit=None, offset=None, include=()):
+        keys = [id_ for id_ in ids if id_ in self.rows] if ids is not None else list(self.rows)
+        keys = keys[offset or 0:][:limit] if limit is not None else keys[offset or 0:]
+        return {
+            'ids':        keys,
+            'documents':  [self.rows[id_][0] for id_ in keys],
+            'embeddings': [self.rows[id_][1] for id_ in keys],
+            'metadatas':  [self.rows[id_][2] for id_ in keys],
+        }
+
+
+class _Client:
+    def __init__(self):
+        self.collections = {}
+        self.upserts = 0
+        self.fail_at = None
+
+    def get_or_create_collection(self, name, configuration=None):
+        return self.collections.setdefault(name, _Collection(name, self))
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def list_collections(self):
+        return list(self.collections)
+
+
+class _Tokenizer:
+    """Whitespace tokens, with the offset mapping Chunker.split() reads."""
+
+    model_max_length = 512
+
+    def num_special_tokens_to_add(self) -> int:
+        return 2
+
+    def __call__(self, text, **kwargs):
+        return {'offset_mapping': [m.span() for m in re.finditer(r"\S+", text)]}
+
+
+def _embed(text: str) -> np.ndarray:
+    vec = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIM).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class BuildResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.client = _Client()
+        self.embedded = []
+
+        def embed_stream(texts):
+            for text in texts:
+                self.embedded.append(text)
+                yield _embed(text)
+
+        chromadb = types.SimpleNamespace(PersistentClient=lambda path: self.client)
+        patches = [
+            mock.patch.dict(sys.modules, {'chromadb': chromadb}),
+            mock.patch.dict(build_index.config, {'dedup_threshold': None}),
+            mock.patch.object(build_index, 'embed_stream', embed_stream),
+            mock.patch.object(build_index, 'get_model', lambda: types.SimpleNamespace(max_seq_length=512)),
+            mock.patch.object(build_index.Chunker, 'from_pretrained', lambda *a, **k: Chunker(_Tokenizer())),
+            mock.patch.object(build_index, 'BATCH', 2),
+            mock.patch('sys.stdout', io.StringIO()),
+            mock.patch('sys.stderr', io.StringIO()),
+        ]
+        paths = {
+            '_chroma_path': str(self.dir / "chroma_db"), '_bm25_path': self.dir / "bm25",
+            '_manifest_path': self.dir / "index_manifest.json",
+            '_checkpoint_path': self.dir / "index_checkpoint.json",
+            '_dedup_path': self.dir / "dedup.json", '_dedup_state_path': self.dir / "dedup_state",
+            '_centroids_path': self.dir / "shard_centroids.npz", '_version_path': self.dir / "index_version",
+        }
+        patches += [mock.patch.object(build_index, name, value) for name, value in paths.items()]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _write_corpus(self, n: int) -> Path:
+        path = self.dir / "corpus.jsonl"
+        with open(path, "w") as f:
+            for i in range(n):
+                f.write(json.dumps({'id': f"d{i}", 'abstract': f"abstract {i} on condition {i % 3}"}) + "\n")
+        return path
+
+    def _build(self, corpus: Path, *flags):
+        argv = ["build_index.py", "--source", "jsonl", "--path", str(corpus), *flags]
+        with mock.patch.object(sys, 'argv', argv):
+            build_index.main()
+
+    def _assert_complete(self, n: int):
+        ids = [chunk_id(f"d{i}", 0) for i in range(n)]
+        collection = self.client.collections[build_index.config['collection_name']]
+        self.assertEqual(sorted(collection.rows), sorted(ids))
+        self.assertEqual(sorted(BM25Index(build_index._bm25_path).ids), sorted(ids))
+        self.assertFalse(build_index._checkpoint_path.exists())
+
+    def test_crash_before_bm25_is_redone_on_rerun(self):
+        self._build(self._write_corpus(4))
+        corpus = self._write_corpus(7)
+        with mock.patch.object(build_index, '_rebuild_bm25', side_effect=RuntimeError("stand-in crash")):
+            with self.assertRaises(RuntimeError):
+                self._build(corpus)
+        self.assertTrue(build_index._checkpoint_path.exists())
+        version = build_index._version_path.read_text()
+
+        # Every document is already written and recorded; the checkpoint alone says BM25 is stale.
+        self.embedded.clear()
+        self._build(corpus)
+        self.assertEqual(self.embedded, [])
+        self._assert_complete(7)
+        self.assertNotEqual(build_index._version_path.read_text(), version)
+
+    def test_crash_mid_write_resumes_after_committed_batches(self):
+        corpus = self._write_corpus(9)
+        self.client.fail_at = 3  # after two batches of two chunks
+        with self.assertRaises(RuntimeError):
+            self._build(corpus)
+        self.assertTrue(build_index._checkpoint_path.exists())
+        self.assertFalse((build_index._bm25_path / "meta.json").exists())
+
+        self.client.fail_at = None
+        self.embedded.clear()
+        self._build(corpus, "--resume")
+        self.assertEqual(len(self.embedded), 5)  # only the documents after the checkpoint
+        self._assert_complete(9)
+
+
+if __name__ == "__main__":
+    unittest.main()